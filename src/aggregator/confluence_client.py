@@ -52,6 +52,25 @@ class ConfluenceClient(AtlassianClient):
             response.raise_for_status()
             return response.json()
 
+    async def get_pages(self, page_ids: List[str]) -> List[Dict]:
+        """
+        Fetch several Confluence pages by ID in a single CQL search.
+
+        Args:
+            page_ids: Numeric Confluence page IDs
+
+        Returns:
+            Page data including content (pages that don't exist are omitted)
+
+        Raises:
+            httpx.HTTPError: If the request fails
+        """
+        if not page_ids:
+            return []
+        logger.info(f"Fetching {len(page_ids)} Confluence pages in one request")
+        cql = f"id in ({','.join(page_ids)})"
+        return await self.search_pages(cql, limit=len(page_ids))
+
     async def search_pages(self, cql: str, limit: int = 25, start: int = 0) -> List[Dict]:
         """
         Search for Confluence pages using CQL with pagination support.
@@ -79,13 +98,16 @@ class ConfluenceClient(AtlassianClient):
 
         return data.get("results", [])
 
-    async def find_related_pages(self, story_key: str, labels: List[str] = None) -> List[Dict]:
+    async def find_related_pages(
+        self, story_key: str, labels: List[str] = None, search_spaces: bool = True
+    ) -> List[Dict]:
         """
         Find Confluence pages related to a Jira story.
 
         Args:
             story_key: Jira issue key
             labels: Additional labels to search for
+            search_spaces: Also search the common PRD/tech design spaces
 
         Returns:
             List of related pages
@@ -104,7 +126,7 @@ class ConfluenceClient(AtlassianClient):
             logger.debug(f"Story key search failed: {e}")
 
         # Strategy 2: Search in specific spaces (common PRD/tech design spaces)
-        common_spaces = ["PROD", "TECH", "ENG", "DOC", "PLAT"]  # Add your spaces
+        common_spaces = ["PROD", "TECH", "ENG", "DOC", "PLAT"] if search_spaces else []  # Add your spaces
         for space in common_spaces:
             try:
                 cql = f'space = "{space}" AND (text ~ "{story_key}" OR text ~ "POP" OR text ~ "ID alignment") AND type = page ORDER BY lastmodified DESC'
@@ -2,8 +2,9 @@
 Jira client for fetching stories and issues.
 """
 
+import asyncio
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 import httpx
 from loguru import logger
@@ -11,10 +12,36 @@ from loguru import logger
 from src.core.atlassian_client import AtlassianClient
 from src.models.story import JiraStory
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _orjson_response_hook(response, *args, **kwargs):
+    """
+    requests response hook that makes response.json() decode with orjson.
+
+    The Jira SDK decodes every payload through response.json(), so this speeds
+    up large search pages without bypassing the SDK's endpoints or error handling.
+    """
+    def _json(**_kwargs):
+        return orjson.loads(response.content)
+    response.json = _json
+    return response
+
 
 class JiraClient(AtlassianClient):
     """Client for interacting with Jira API."""
 
+    # Common custom field names for acceptance criteria
+    AC_FIELD_NAMES = (
+        "customfield_10100",  # Common AC field
+        "customfield_10200",
+        "Acceptance Criteria",
+    )
+
     def __init__(
         self,
         base_url: Optional[str] = None,
@@ -31,6 +58,26 @@ class JiraClient(AtlassianClient):
         """
         super().__init__(base_url=base_url, email=email, api_token=api_token)
 
+    async def validate_connection(self, timeout: float = 10.0) -> bool:
+        """
+        Check that Jira is reachable and the credentials are accepted.
+
+        Args:
+            timeout: Seconds to wait before treating Jira as unreachable
+
+        Returns:
+            True if connection is valid, False otherwise
+        """
+        try:
+            jira = await asyncio.wait_for(self._call_jira(self._get_jira_sdk_client), timeout=timeout)
+            if not jira:
+                return False
+            await asyncio.wait_for(self._call_jira(jira.myself), timeout=timeout)
+            return True
+        except Exception as e:
+            logger.error("Jira connection validation failed: {}", e)
+            return False
+
     def _extract_text_from_adf(self, adf_content: Any) -> str:
         """
         Extract plain text and URLs from Atlassian Document Format (ADF) JSON.
@@ -42,14 +89,16 @@ class JiraClient(AtlassianClient):
         Returns:
             Plain text extracted from ADF with URLs included
         """
-        logger.debug(f"Extracting text from ADF (type: {type(adf_content).__name__})")
-        
-        if isinstance(adf_content, str):
+        # Fast path: many issues come back as plain (wiki renderer) strings.
+        # SDK output never subclasses str/dict, so exact type checks are safe.
+        content_type = type(adf_content)
+        if content_type is str:
             return adf_content
         
-        if not isinstance(adf_content, dict):
+        if content_type is not dict:
             return str(adf_content) if adf_content else ""
         
+        logger.debug("Extracting text from ADF document")
         text_parts = []
         
         def extract_recursive(node):
@@ -68,15 +117,14 @@ class JiraClient(AtlassianClient):
                             if mark.get('type') == 'link':
                                 href = mark.get('attrs', {}).get('href', '')
                                 if href:
-                                    # Add the URL right after the link text
-                                    text_parts.append(f' [{href}] ')
+                                    # Add the URL right after the link text (join adds the spaces)
+                                    text_parts.extend(('[', href, ']'))
                 
                 # Extract inlineCard nodes (Confluence/Jira links) - CRITICAL FOR CONFLUENCE!
                 elif node_type == 'inlineCard':
                     url = node.get('attrs', {}).get('url', '')
                     if url:
-                        logger.info(f"Found inlineCard URL: {url}")
-                        text_parts.append(f' {url} ')
+                        text_parts.append(url)
                 
                 # Add newlines for paragraphs
                 if node_type == 'paragraph':
@@ -96,12 +144,12 @@ class JiraClient(AtlassianClient):
     
     async def get_issue_comments(self, issue_key: str) -> List[Dict]:
         """Fetch all comments for a Jira issue using SDK."""
-        jira = self._get_jira_sdk_client()
+        jira = await self._call_jira(self._get_jira_sdk_client)
         if not jira:
             return []
         
         try:
-            issue = jira.issue(issue_key, expand='comments')
+            issue = await self._call_jira(jira.issue, issue_key, expand='comments')
             comments = []
             
             if hasattr(issue.fields, 'comment') and issue.fields.comment:
@@ -112,20 +160,62 @@ class JiraClient(AtlassianClient):
                         'created': comment.created
                     })
             
-            logger.info(f"Found {len(comments)} comments for {issue_key}")
+            logger.info("Found {} comments for {}", len(comments), issue_key)
             return comments
         except Exception as e:
-            logger.error(f"Error fetching comments with SDK: {e}")
+            logger.error("Error fetching comments with SDK: {}", e)
             return []
 
+    async def search_with_comments(self, jql: str, max_results: int = 100) -> Dict[str, List[Dict]]:
+        """
+        Fetch the comments of every issue matching a JQL query in one request.
+
+        Args:
+            jql: JQL query string (e.g. 'parent = PROJ-123')
+            max_results: Maximum number of issues to return
+
+        Returns:
+            Mapping of issue key to its comments, in get_issue_comments format
+
+        Raises:
+            Exception: If the search fails, so callers can fall back to per-issue fetches
+        """
+        jira = await self._call_jira(self._get_jira_sdk_client)
+        if not jira:
+            return {}
+
+        data = await self._call_jira(
+            self._search_raw, jira, jql, max_results=max_results, fields="comment"
+        )
+        comments_by_key = {}
+        for issue in data.get("issues", []):
+            comment_field = (issue.get("fields") or {}).get("comment") or {}
+            comments_by_key[issue["key"]] = [
+                {
+                    'author': (comment.get("author") or {}).get("displayName", 'Unknown'),
+                    'body': self._extract_text_from_adf(comment.get("body")),
+                    'created': comment.get("created"),
+                }
+                for comment in comment_field.get("comments", [])
+            ]
+        logger.info("Fetched comments for {} issues matching {}", len(comments_by_key), jql)
+        return comments_by_key
+
+    async def _call_jira(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking Jira SDK call in a worker thread so it doesn't stall the event loop."""
+        return await asyncio.to_thread(func, *args, **kwargs)
+
     def _get_jira_sdk_client(self):
         """Get Jira SDK client instance."""
         try:
             from jira import JIRA
-            return JIRA(
+            jira = JIRA(
                 server=self.base_url,
                 basic_auth=(self.email, self.api_token)
             )
+            if ORJSON_AVAILABLE:
+                jira._session.hooks["response"].append(_orjson_response_hook)
+            return jira
         except ImportError:
             logger.warning("Jira SDK not installed. Install with: pip install jira")
             return None
@@ -219,31 +309,9 @@ class JiraClient(AtlassianClient):
         Returns:
             Acceptance criteria string or None
         """
-        # Check common custom field names for acceptance criteria
-        ac_field_names = [
-            "customfield_10100",  # Common AC field
-            "customfield_10200",
-            "Acceptance Criteria",
-        ]
-
-        for field_name in ac_field_names:
-            if hasattr(fields, field_name):
-                ac_value = getattr(fields, field_name)
-                if ac_value:
-                    if isinstance(ac_value, str):
-                        return ac_value
-                    elif isinstance(ac_value, dict):
-                        return self._extract_text_from_adf(ac_value)
-
-        # Try to find AC in description
-        if description and "acceptance criteria" in description.lower():
-            parts = description.lower().split("acceptance criteria")
-            if len(parts) > 1:
-                # Get the part after "acceptance criteria"
-                ac_part = parts[1].split("\n\n")[0]  # Until next paragraph
-                return ac_part.strip()
-
-        return None
+        # SDK fields are attributes; reuse the dict-based extractor for the rest
+        ac_fields = {name: getattr(fields, name, None) for name in self.AC_FIELD_NAMES}
+        return self._extract_acceptance_criteria(ac_fields, description)
 
     async def get_issue_with_subtasks(self, issue_key: str) -> tuple[JiraStory, List[JiraStory]]:
         """
@@ -253,58 +321,58 @@ class JiraClient(AtlassianClient):
             issue_key: Jira issue key
             
         Returns:
-            Tuple of (main_story, subtasks)
+            Tuple of (main_story, subtasks); subtasks are always parsed JiraStory objects
         """
-        jira = self._get_jira_sdk_client()
+        jira = await self._call_jira(self._get_jira_sdk_client)
         if not jira:
             # Fallback to REST API
             main_story = await self.get_issue(issue_key)
             return main_story, []
         
         try:
-            issue = jira.issue(issue_key, expand='subtasks')
+            issue = await self._call_jira(jira.issue, issue_key, expand='subtasks')
             main_story = self._parse_sdk_issue(issue)
             
             subtasks = []
             if hasattr(issue.fields, 'subtasks') and issue.fields.subtasks:
-                logger.info(f"Found {len(issue.fields.subtasks)} subtasks for {issue_key}")
+                logger.info("Found {} subtasks for {}", len(issue.fields.subtasks), issue_key)
                 for subtask in issue.fields.subtasks:
                     try:
                         # Fetch subtask with full data
-                        full_subtask = jira.issue(subtask.key)
+                        full_subtask = await self._call_jira(jira.issue, subtask.key)
                         subtasks.append(self._parse_sdk_issue(full_subtask))
                     except Exception as e:
-                        logger.warning(f"Could not fetch subtask {subtask.key}: {e}")
+                        logger.warning("Could not fetch subtask {}: {}", subtask.key, e)
             
             return main_story, subtasks
             
         except Exception as e:
-            logger.error(f"Error fetching with SDK: {e}")
+            logger.error("Error fetching with SDK: {}", e)
             # Fallback to REST API
             main_story = await self.get_issue(issue_key)
             return main_story, []
 
     async def get_issue(self, issue_key: str) -> JiraStory:
         """Fetch a single Jira issue by key using SDK."""
-        jira = self._get_jira_sdk_client()
+        jira = await self._call_jira(self._get_jira_sdk_client)
         if not jira:
             return None
         
         try:
-            issue = jira.issue(issue_key)
+            issue = await self._call_jira(jira.issue, issue_key)
             return self._parse_sdk_issue(issue)
         except Exception as e:
-            logger.error(f"Error fetching issue with SDK: {e}")
+            logger.error("Error fetching issue with SDK: {}", e)
             return None
 
     async def get_linked_issues(self, issue_key: str) -> List[JiraStory]:
         """Fetch all issues linked to the given issue using SDK."""
-        jira = self._get_jira_sdk_client()
+        jira = await self._call_jira(self._get_jira_sdk_client)
         if not jira:
             return []
         
         try:
-            issue = jira.issue(issue_key, expand='issuelinks')
+            issue = await self._call_jira(jira.issue, issue_key, expand='issuelinks')
             linked_stories = []
             
             if hasattr(issue.fields, 'issuelinks') and issue.fields.issuelinks:
@@ -318,34 +386,113 @@ class JiraClient(AtlassianClient):
                     if linked_issue:
                         try:
                             # Fetch linked issue with full data
-                            full_linked = jira.issue(linked_issue.key)
+                            full_linked = await self._call_jira(jira.issue, linked_issue.key)
                             story = self._parse_sdk_issue(full_linked)
                             linked_stories.append(story)
                         except Exception as e:
-                            logger.warning(f"Could not fetch linked issue {linked_issue.key}: {e}")
+                            logger.warning("Could not fetch linked issue {}: {}", linked_issue.key, e)
             
             return linked_stories
         except Exception as e:
-            logger.error(f"Error fetching linked issues with SDK: {e}")
+            logger.error("Error fetching linked issues with SDK: {}", e)
             return []
 
-    async def search_issues(self, jql: str, max_results: int = 50, start_at: int = 0) -> List[JiraStory]:
-        """Search for issues using JQL with SDK."""
-        jira = self._get_jira_sdk_client()
+    async def search_issues(
+        self,
+        jql: str,
+        max_results: int = 50,
+        next_page_token: Optional[str] = None,
+        raise_errors: bool = False,
+    ) -> List[JiraStory]:
+        """
+        Search for issues using JQL with SDK.
+
+        Failures are logged and return an empty list, unless raise_errors is set
+        so callers can tell a rejected query from one with no matches.
+        """
+        jira = await self._call_jira(self._get_jira_sdk_client)
         if not jira:
             return []
         
         try:
-            logger.info(f"Searching Jira issues with SDK JQL: {jql} (startAt={start_at}, maxResults={max_results})")
-            # Use enhanced_search_issues for Jira Cloud (old search is deprecated)
-            # CRITICAL: Must pass startAt parameter, otherwise returns same results forever!
-            issues = jira.search_issues(jql, maxResults=max_results, startAt=start_at)
-            return [self._parse_sdk_issue(issue) for issue in issues]
+            logger.info("Searching Jira issues with SDK JQL: {} (maxResults={})", jql, max_results)
+            data = await self._call_jira(
+                self._search_raw, jira, jql, max_results=max_results, next_page_token=next_page_token
+            )
+            return self._parse_search_page(jira, data)
         except Exception as e:
-            # If old method fails, we still return empty (don't want infinite loop!)
-            logger.error(f"Error searching with SDK: {e}")
+            if raise_errors:
+                raise
+            # If the search fails, we still return empty (don't want infinite loop!)
+            logger.error("Error searching with SDK: {}", e)
+            return []
+
+    async def search_all_issues(self, jql: str, page_size: int = 100) -> List[JiraStory]:
+        """
+        Fetch every issue matching a JQL query.
+
+        The /search/jql endpoint pages with nextPageToken and reports no total,
+        so pages are fetched in order until Jira stops returning a token.
+
+        Args:
+            jql: JQL query string
+            page_size: Issues per page request
+
+        Returns:
+            All matching issues, in query order
+        """
+        jira = await self._call_jira(self._get_jira_sdk_client)
+        if not jira:
             return []
 
+        stories: List[JiraStory] = []
+        next_page_token = None
+        try:
+            while True:
+                data = await self._call_jira(
+                    self._search_raw, jira, jql, max_results=page_size, next_page_token=next_page_token
+                )
+                stories.extend(self._parse_search_page(jira, data))
+                next_page_token = data.get("nextPageToken")
+                if not next_page_token or data.get("isLast", False):
+                    break
+        except Exception as e:
+            logger.error("Error searching with SDK after {} issues: {}", len(stories), e)
+
+        logger.info("JQL matched {} issues", len(stories))
+        return stories
+
+    def _search_raw(
+        self,
+        jira,
+        jql: str,
+        max_results: int,
+        next_page_token: Optional[str] = None,
+        fields: str = "*all",
+    ) -> Dict[str, Any]:
+        """
+        Fetch one page of the JQL search as a raw payload.
+
+        Uses enhanced_search_issues (/search/jql) for Jira Cloud, as the old
+        search endpoint is deprecated. The SDK raises JIRAError on error
+        responses; the body is decoded by the session's orjson hook when installed.
+        """
+        return jira.enhanced_search_issues(
+            jql,
+            nextPageToken=next_page_token,
+            maxResults=max_results,
+            fields=fields,
+            json_result=True,
+        )
+
+    def _parse_search_page(self, jira, data: Dict[str, Any]) -> List[JiraStory]:
+        """Parse the issues of a raw search page, wrapped as SDK Issues."""
+        from jira.resources import Issue
+
+        return [
+            self._parse_sdk_issue(Issue(jira._options, jira._session, raw=raw))
+            for raw in data.get("issues", [])
+        ]
 
     def _parse_issue(self, issue_data: Dict[str, Any]) -> JiraStory:
         """
@@ -357,28 +504,24 @@ class JiraClient(AtlassianClient):
         Returns:
             JiraStory object
         """
-        fields = issue_data.get("fields", {})
+        fields = issue_data.get("fields") or {}
 
         # Extract basic fields
         key = issue_data.get("key", "")
         summary = fields.get("summary", "")
         # Extract description (handle ADF format)
-        description_raw = fields.get("description")
-        description = self._extract_text_from_adf(description_raw)
-
-        # Handle new Atlassian Document Format (ADF) for description
-        if isinstance(description, dict):
-            description = self._extract_text_from_adf(description)
+        description = self._extract_text_from_adf(fields.get("description"))
 
-        issue_type = fields.get("issuetype", {}).get("name", "Unknown")
-        status = fields.get("status", {}).get("name", "Unknown")
-        priority = fields.get("priority", {}).get("name", "Medium")
+        # `or {}` also covers fields Jira returns as explicit nulls
+        issue_type = (fields.get("issuetype") or {}).get("name", "Unknown")
+        status = (fields.get("status") or {}).get("name", "Unknown")
+        priority = (fields.get("priority") or {}).get("name", "Medium")
 
         # Extract people
         assignee_data = fields.get("assignee")
         assignee = assignee_data.get("emailAddress") if assignee_data else None
 
-        reporter_data = fields.get("reporter", {})
+        reporter_data = fields.get("reporter") or {}
         reporter = reporter_data.get("emailAddress", "unknown@example.com")
 
         # Extract dates
@@ -386,18 +529,17 @@ class JiraClient(AtlassianClient):
         updated = self._parse_datetime(fields.get("updated"))
 
         # Extract arrays
-        labels = fields.get("labels", [])
-        components = [c.get("name", "") for c in fields.get("components", [])]
+        labels = fields.get("labels") or []
+        components = [c.get("name", "") for c in fields.get("components") or ()]
 
         # Extract attachments
         attachments = [
-            att.get("content", "") for att in fields.get("attachment", [])
+            att.get("content", "") for att in fields.get("attachment") or ()
         ]
 
         # Extract linked issues
-        issuelinks = fields.get("issuelinks", [])
         linked_issues = []
-        for link in issuelinks:
+        for link in fields.get("issuelinks") or ():
             linked_issue = link.get("inwardIssue") or link.get("outwardIssue")
             if linked_issue:
                 linked_issues.append(linked_issue.get("key", ""))
@@ -454,14 +596,7 @@ class JiraClient(AtlassianClient):
         Returns:
             Acceptance criteria string or None
         """
-        # Check common custom field names for acceptance criteria
-        ac_field_names = [
-            "customfield_10100",  # Common AC field
-            "customfield_10200",
-            "Acceptance Criteria",
-        ]
-
-        for field_name in ac_field_names:
+        for field_name in self.AC_FIELD_NAMES:
             ac_value = fields.get(field_name)
             if ac_value:
                 if isinstance(ac_value, str):
@@ -2,31 +2,100 @@
 Story collector that aggregates data from multiple sources.
 """
 
-from typing import Dict, List, Optional
+import asyncio
+import io
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Dict, List, NamedTuple, Optional
 
+import httpx
 from loguru import logger
 
 from src.models.story import JiraStory
+from src.utils.cache import AsyncTTLCache
 
 from .confluence_client import ConfluenceClient
 from .jira_client import JiraClient
 
-
-class StoryContext(dict):
+# Full Confluence page URLs: /wiki/spaces/SPACE/pages/12345
+_CONFLUENCE_LINK_RE = re.compile(r'https://[^/]+/wiki/spaces/([^/]+)/pages/([^/#\s]+)(?:/([^#\s]+))?')
+# Short Confluence URLs: /wiki/x/ABC123
+_CONFLUENCE_SHORT_LINK_RE = re.compile(r'https://([^/]+)/wiki/x/([a-zA-Z0-9_-]+)')
+# Workflow labels that appear on most issues and say nothing about the feature
+_GENERIC_LABELS = frozenset({
+    "triaged", "needs-triage", "needs-review", "reviewed", "backlog", "todo",
+    "wip", "blocked", "ready-for-qa", "qa", "tech-debt", "groomed", "sprint",
+})
+# Max labels/components per "in (...)" clause in the related-bugs JQL
+_MAX_JQL_FILTER_VALUES = 10
+_PAGE_ID_RE = re.compile(r'/pages/(\d+)')
+_SPACE_KEY_RE = re.compile(r'/spaces/([^/]+)')
+
+
+def _write_truncated(buf: io.StringIO, prefix: str, text: str, limit: int) -> None:
+    """Write a prefixed line, cutting text at limit chars and marking the cut with '...'."""
+    buf.write(prefix)
+    if len(text) > limit:
+        buf.write(text[:limit])
+        buf.write("...\n")
+    else:
+        buf.write(text)
+        buf.write("\n")
+
+
+class ConfluenceDoc(NamedTuple):
+    """A Confluence page collected as story context."""
+
+    id: Optional[str]
+    title: Optional[str]
+    space: Optional[str]
+    url: str
+    content: str
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style lookup for callers that also accept raw doc dicts."""
+        return getattr(self, key, default)
+
+
+@dataclass(slots=True)
+class StoryContext:
     """
     Enhanced context object that contains story and all related information.
-    Acts as a dict but with typed access.
+    Typed fields, with dict-style access (context["linked_stories"],
+    context.get(...), "key" in context) kept for existing callers.
     """
 
-    def __init__(self, main_story: JiraStory):
-        super().__init__()
-        self.main_story = main_story
-        self["main_story"] = main_story
-        self["linked_stories"] = []
-        self["confluence_docs"] = []
-        self["figma_designs"] = []
-        self["related_bugs"] = []
-        self["context_graph"] = {}
+    main_story: JiraStory
+    linked_stories: List[JiraStory] = field(default_factory=list)
+    confluence_docs: List[ConfluenceDoc] = field(default_factory=list)
+    figma_designs: List[Dict] = field(default_factory=list)
+    related_bugs: List[JiraStory] = field(default_factory=list)
+    context_graph: Dict[str, Any] = field(default_factory=dict)
+    subtasks: List[JiraStory] = field(default_factory=list)
+    story_comments: List[Dict] = field(default_factory=list)
+    subtask_comments: Dict[str, List[Dict]] = field(default_factory=dict)
+    full_context_text: str = ""
+    extras: Dict[str, Any] = field(default_factory=dict)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.__dataclass_fields__:
+            return getattr(self, key)
+        return self.extras[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self.__dataclass_fields__:
+            setattr(self, key, value)
+        else:
+            self.extras[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__dataclass_fields__ or key in self.extras
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style lookup returning default for unknown keys."""
+        if key in self.__dataclass_fields__:
+            return getattr(self, key)
+        return self.extras.get(key, default)
 
 
 class StoryCollector:
@@ -39,6 +108,7 @@ class StoryCollector:
         self,
         jira_client: Optional[JiraClient] = None,
         confluence_client: Optional[ConfluenceClient] = None,
+        max_concurrency: int = 8,
     ):
         """
         Initialize story collector.
@@ -46,9 +116,32 @@ class StoryCollector:
         Args:
             jira_client: Jira client instance (creates new if None)
             confluence_client: Confluence client instance (creates new if None)
+            max_concurrency: Max concurrent requests per fan-out (respects API rate limits)
         """
         self.jira_client = jira_client or JiraClient()
         self.confluence_client = confluence_client or ConfluenceClient()
+        self.max_concurrency = max_concurrency
+        # Comments and Confluence pages are re-requested across sibling stories;
+        # JQL searches are not cached since their results must stay fresh
+        self._comments_cache = AsyncTTLCache(maxsize=1024, ttl=300)
+        self._page_cache = AsyncTTLCache(maxsize=1024, ttl=300)
+
+    def reset_cache(self) -> None:
+        """Drop cached comments and Confluence pages."""
+        self._comments_cache.clear()
+        self._page_cache.clear()
+
+    async def _get_issue_comments(self, issue_key: str) -> List[Dict]:
+        """Fetch comments for an issue through the comments cache."""
+        return await self._comments_cache.get_or_fetch(
+            issue_key, lambda: self.jira_client.get_issue_comments(issue_key)
+        )
+
+    async def _get_page(self, page_id: str) -> Dict:
+        """Fetch a Confluence page through the page cache."""
+        return await self._page_cache.get_or_fetch(
+            page_id, lambda: self.confluence_client.get_page(page_id)
+        )
 
     async def collect_story_context(self, issue_key: str, include_subtasks: bool = True) -> StoryContext:
         """
@@ -68,73 +161,117 @@ class StoryCollector:
         
         context = StoryContext(main_story)
         if include_subtasks and subtasks:
-            context["subtasks"] = subtasks
+            context.subtasks = subtasks
         
-        # 1.5 Fetch comments for story and subtasks (developer insights)
-        try:
-            story_comments = await self.jira_client.get_issue_comments(issue_key)
-            context["story_comments"] = story_comments
-            logger.info(f"Found {len(story_comments)} comments on main story")
-            
-            if include_subtasks and subtasks:
-                subtask_comments = {}
-                for subtask in subtasks:
-                    # subtask is a JiraStory object, not a dict
-                    subtask_key = subtask.key if hasattr(subtask, 'key') else subtask.get('key')
-                    if subtask_key:
-                        try:
-                            comments = await self.jira_client.get_issue_comments(subtask_key)
-                            if comments:
-                                subtask_comments[subtask_key] = comments
-                        except Exception as e:
-                            logger.debug(f"Could not fetch comments for {subtask_key}: {e}")
-                
-                context["subtask_comments"] = subtask_comments
-                total_subtask_comments = sum(len(c) for c in subtask_comments.values())
-                logger.info(f"Found {total_subtask_comments} comments across {len(subtask_comments)} subtasks")
-        except Exception as e:
-            logger.warning(f"Failed to fetch comments: {e}")
-
-        # 2. Fetch linked issues
-        linked_stories = []
-        try:
-            linked_stories = await self.jira_client.get_linked_issues(issue_key)
-            context["linked_stories"] = linked_stories
-            logger.info(f"Found {len(linked_stories)} linked issues")
-        except Exception as e:
-            logger.warning(f"Failed to fetch linked issues: {e}")
-            context["linked_stories"] = []
-
-        # 3. Fetch related bugs (issues that might be related)
-        related_bugs = []
-        try:
-            related_bugs = await self._fetch_related_bugs(main_story)
-            context["related_bugs"] = related_bugs
-            logger.info(f"Found {len(related_bugs)} related bugs")
-        except Exception as e:
-            logger.warning(f"Failed to fetch related bugs: {e}")
-            context["related_bugs"] = []
+        # 1.5-4. Comments, linked issues, related bugs and Confluence docs don't
+        # depend on each other, so fetch them concurrently. Each step is guarded
+        # so one failing source can't cancel the others.
+        steps = [
+            self._guarded(self._get_issue_comments(issue_key), [], "comments"),
+            self._guarded(
+                self._fetch_subtask_comments(issue_key, subtasks if include_subtasks else []),
+                {},
+                "subtask comments",
+            ),
+            self._guarded(self.jira_client.get_linked_issues(issue_key), [], "linked issues"),
+            self._guarded(self._fetch_related_bugs(main_story), [], "related bugs"),
+            self._guarded(self._fetch_confluence_docs(main_story), [], "Confluence docs"),
+        ]
+        if hasattr(asyncio, "TaskGroup"):
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(step) for step in steps]
+            fetched = [task.result() for task in tasks]
+        else:  # Python 3.10
+            fetched = await asyncio.gather(*steps)
+        story_comments, subtask_comments, linked_stories, related_bugs, confluence_docs = fetched
+
+        context.story_comments = story_comments
+        logger.info(f"Found {len(story_comments)} comments on main story")
+        if include_subtasks and subtasks:
+            context.subtask_comments = subtask_comments
+            total_subtask_comments = sum(len(c) for c in subtask_comments.values())
+            logger.info(f"Found {total_subtask_comments} comments across {len(subtask_comments)} subtasks")
 
-        # 4. Fetch related Confluence documentation (PRD, tech design, etc.)
-        try:
-            confluence_docs = await self._fetch_confluence_docs(main_story)
-            context["confluence_docs"] = confluence_docs
-            logger.info(f"Found {len(confluence_docs)} related Confluence pages")
-        except Exception as e:
-            logger.warning(f"Failed to fetch Confluence docs: {e}")
-            context["confluence_docs"] = []
+        context.linked_stories = linked_stories
+        logger.info(f"Found {len(linked_stories)} linked issues")
+        context.related_bugs = related_bugs
+        logger.info(f"Found {len(related_bugs)} related bugs")
+        context.confluence_docs = confluence_docs
+        logger.info(f"Found {len(confluence_docs)} related Confluence pages")
 
         # 5. Build context graph (relationships between items)
-        context["context_graph"] = self._build_context_graph(
+        context.context_graph = self._build_context_graph(
             main_story, linked_stories, related_bugs
         )
 
         # 6. Extract all text content for AI context
-        context["full_context_text"] = self._build_full_context_text(context)
+        context.full_context_text = self._build_full_context_text(context)
 
         logger.info(f"Successfully collected context for {issue_key}")
         return context
 
+    @staticmethod
+    async def _guarded(step: Awaitable[Any], default: Any, what: str) -> Any:
+        """Await a fetch step, logging a failure and returning default instead of raising."""
+        try:
+            return await step
+        except Exception as e:
+            logger.warning(f"Failed to fetch {what}: {e}")
+            return default
+
+    async def _fetch_subtask_comments(
+        self, parent_key: str, subtasks: List[JiraStory]
+    ) -> Dict[str, List[Dict]]:
+        """
+        Fetch comments for every subtask.
+
+        Uses one bulk JQL search over the parent's children; subtasks the bulk
+        result doesn't cover (or all of them, if the search fails) are fetched
+        concurrently one at a time.
+
+        Args:
+            parent_key: Key of the main story
+            subtasks: Subtasks of the main story
+
+        Returns:
+            Mapping of subtask key to its comments (subtasks without comments are omitted)
+        """
+        # Dedupe (keeping order) so a subtask listed twice isn't fetched twice
+        subtask_keys = list(dict.fromkeys(subtask.key for subtask in subtasks if subtask.key))
+        if not subtask_keys:
+            return {}
+
+        subtask_comments = {}
+        missing_keys = subtask_keys
+        try:
+            bulk = await self.jira_client.search_with_comments(
+                f'parent = {parent_key}', max_results=100
+            )
+            subtask_comments = {key: bulk[key] for key in subtask_keys if bulk.get(key)}
+            # Keys absent from the result (e.g. past the page limit) weren't checked at all
+            missing_keys = [key for key in subtask_keys if key not in bulk]
+            if not missing_keys:
+                return subtask_comments
+            logger.debug(f"Bulk subtask comment search missed {len(missing_keys)} subtasks, fetching them individually")
+        except Exception as e:
+            logger.debug(f"Bulk subtask comment search failed, fetching per subtask: {e}")
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch_comments(subtask_key: str) -> List[Dict]:
+            async with semaphore:
+                return await self._get_issue_comments(subtask_key)
+
+        results = await asyncio.gather(
+            *(fetch_comments(key) for key in missing_keys), return_exceptions=True
+        )
+        for subtask_key, comments in zip(missing_keys, results):
+            if isinstance(comments, Exception):
+                logger.debug(f"Could not fetch comments for {subtask_key}: {comments}")
+            elif comments:
+                subtask_comments[subtask_key] = comments
+        return subtask_comments
+
     async def _fetch_related_bugs(self, story: JiraStory) -> List[JiraStory]:
         """
         Fetch bugs that are related to this story based on components, labels, etc.
@@ -148,14 +285,29 @@ class StoryCollector:
         # Build JQL to find related bugs
         jql_parts = ['type = Bug']
 
+        # Keep the IN lists short and specific so Jira doesn't scan huge label indexes
+        components = story.components[:_MAX_JQL_FILTER_VALUES]
+        labels = [l for l in story.labels if l.lower() not in _GENERIC_LABELS][:_MAX_JQL_FILTER_VALUES]
+        dropped_components = set(story.components) - set(components)
+        dropped_labels = set(story.labels) - set(labels)
+        if dropped_components:
+            logger.debug(f"Ignoring components beyond the first {_MAX_JQL_FILTER_VALUES} for related bugs: {sorted(dropped_components)}")
+        if dropped_labels:
+            logger.debug(f"Ignoring generic or excess labels for related bugs: {sorted(dropped_labels)}")
+
+        if not components and not labels:
+            # "type = Bug AND created >= -90d" alone would just return arbitrary recent bugs
+            logger.debug(f"No specific components or labels on {story.key}, skipping related bugs")
+            return []
+
         # Add component filter if story has components
-        if story.components:
-            components_str = ", ".join([f'"{c}"' for c in story.components])
+        if components:
+            components_str = ", ".join([f'"{c}"' for c in components])
             jql_parts.append(f"component in ({components_str})")
 
         # Add label filter if story has labels
-        if story.labels:
-            labels_str = ", ".join([f'"{l}"' for l in story.labels])
+        if labels:
+            labels_str = ", ".join([f'"{l}"' for l in labels])
             jql_parts.append(f"labels in ({labels_str})")
 
         # Only get recent bugs
@@ -184,13 +336,25 @@ class StoryCollector:
         """
         logger.info(f"Fetching subtasks for {parent_key}")
 
-        # Try multiple JQL queries to find subtasks
+        # Alternative ways Jira links children to a parent
         queries = [
             f'parent = {parent_key}',  # Direct subtasks
             f'"Parent Link" = {parent_key}',  # Alternative parent field
             f'issue in childIssuesOf("{parent_key}")',  # Jira function
         ]
 
+        # One round trip for all three; the same issue can match several predicates
+        combined_jql = "(" + " OR ".join(queries) + ")"
+        try:
+            results = await self.jira_client.search_issues(
+                combined_jql, max_results=50, raise_errors=True
+            )
+            subtasks = list({issue.key: issue for issue in results}.values())
+            logger.info(f"Found {len(subtasks)} subtasks with query: {combined_jql}")
+            return subtasks
+        except Exception as e:
+            logger.debug(f"Combined subtask query rejected, trying queries one by one: {e}")
+
         subtasks = []
         for jql in queries:
             try:
@@ -205,7 +369,7 @@ class StoryCollector:
         
         return subtasks
 
-    async def _fetch_confluence_docs(self, story: JiraStory) -> List[Dict]:
+    async def _fetch_confluence_docs(self, story: JiraStory) -> List[ConfluenceDoc]:
         """
         Fetch Confluence documentation related to this story.
 
@@ -217,25 +381,17 @@ class StoryCollector:
         """
         try:
             # Extract Confluence links from story description
-            import re
-            import httpx
             confluence_links = []
             if story.description:
                 # Find full Confluence page URLs: /wiki/spaces/SPACE/pages/12345
-                full_links = re.findall(
-                    r'https://[^/]+/wiki/spaces/([^/]+)/pages/([^/#\s]+)(?:/([^#\s]+))?',
-                    story.description
-                )
+                full_links = _CONFLUENCE_LINK_RE.findall(story.description)
                 for match in full_links:
                     space_key = match[0]
                     page_id = match[1]
                     confluence_links.append((space_key, page_id))
                 
                 # Find short Confluence URLs: /wiki/x/ABC123
-                short_links = re.findall(
-                    r'https://([^/]+)/wiki/x/([a-zA-Z0-9_-]+)',
-                    story.description
-                )
+                short_links = _CONFLUENCE_SHORT_LINK_RE.findall(story.description)
                 for domain, short_id in short_links:
                     # Resolve short URL to get page ID
                     try:
@@ -249,8 +405,8 @@ class StoryCollector:
                             )
                             # Extract page ID from final URL
                             final_url = str(response.url)
-                            page_id_match = re.search(r'/pages/(\d+)', final_url)
-                            space_match = re.search(r'/spaces/([^/]+)', final_url)
+                            page_id_match = _PAGE_ID_RE.search(final_url)
+                            space_match = _SPACE_KEY_RE.search(final_url)
                             if page_id_match:
                                 page_id = page_id_match.group(1)
                                 space_key = space_match.group(1) if space_match else "UNKNOWN"
@@ -261,41 +417,68 @@ class StoryCollector:
             
             logger.info(f"Found {len(confluence_links)} Confluence links in story description")
             
-            # Fetch pages directly by ID
-            confluence_docs = []
-            for space_key, page_id in confluence_links:
+            # Fetch uncached pages in one bulk request; anything it misses is
+            # fetched individually below
+            bulk_ids = list(dict.fromkeys(
+                page_id for _, page_id in confluence_links
+                if page_id.isdigit() and page_id not in self._page_cache
+            ))
+            if bulk_ids:
                 try:
-                    page = await self.confluence_client.get_page(page_id)
+                    for page in await self.confluence_client.get_pages(bulk_ids):
+                        self._page_cache.put(str(page.get("id")), page)
+                except Exception as e:
+                    logger.debug(f"Bulk Confluence page fetch failed, fetching one by one: {e}")
+
+            # Fetch pages directly by ID, concurrently
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def fetch_doc(space_key: str, page_id: str) -> Optional[ConfluenceDoc]:
+                try:
+                    async with semaphore:
+                        page = await self._get_page(page_id)
                     if page:
                         # Extract content
                         content = self.confluence_client.extract_page_content(page)
-                        doc = {
-                            "id": page.get("id"),
-                            "title": page.get("title"),
-                            "space": space_key,
-                            "url": f"{self.confluence_client.base_url}/wiki/spaces/{space_key}/pages/{page_id}",
-                            "content": content,
-                        }
-                        confluence_docs.append(doc)
-                        logger.info(f"Fetched Confluence page: {doc['title']}")
+                        doc = ConfluenceDoc(
+                            id=page.get("id"),
+                            title=page.get("title"),
+                            space=space_key,
+                            url=f"{self.confluence_client.base_url}/wiki/spaces/{space_key}/pages/{page_id}",
+                            content=content,
+                        )
+                        logger.info(f"Fetched Confluence page: {doc.title}")
+                        return doc
                 except Exception as e:
                     logger.warning(f"Could not fetch Confluence page {page_id}: {e}")
+                return None
+
+            docs = await asyncio.gather(
+                *(fetch_doc(space_key, page_id) for space_key, page_id in confluence_links)
+            )
+            confluence_docs = [doc for doc in docs if doc]
             
-            # If no direct links found, fall back to search
+            # If no direct links found, fall back to search. Without links or labels
+            # only the cheap search for pages citing the story key is worth running;
+            # the space fan-out would just return recent pages matching generic terms
             if not confluence_docs:
-                logger.info("No direct links found, falling back to search")
+                search_spaces = bool(confluence_links or story.labels)
+                if search_spaces:
+                    logger.info("No direct links found, falling back to search")
+                else:
+                    logger.debug(f"No Confluence links or labels on {story.key}, searching by key only")
                 pages = await self.confluence_client.find_related_pages(
-                    story.key, labels=story.labels
+                    story.key, labels=story.labels, search_spaces=search_spaces
                 )
                 
                 for page in pages:
-                    doc = {
-                        "id": page.get("id"),
-                        "title": page.get("title"),
-                        "space": page.get("space", {}).get("key"),
-                        "url": f"{self.confluence_client.base_url}/wiki{page.get('_links', {}).get('webui', '')}",
-                        "content": self.confluence_client.extract_page_content(page),
-                    }
+                    doc = ConfluenceDoc(
+                        id=page.get("id"),
+                        title=page.get("title"),
+                        space=page.get("space", {}).get("key"),
+                        url=f"{self.confluence_client.base_url}/wiki{page.get('_links', {}).get('webui', '')}",
+                        content=self.confluence_client.extract_page_content(page),
+                    )
                     confluence_docs.append(doc)
 
             return confluence_docs
@@ -320,31 +503,24 @@ class StoryCollector:
         Returns:
             Dictionary representing the context graph
         """
-        graph = {
+        # Categorize linked issues (this is simplified - real implementation
+        # would check the link type)
+        relates_to = [story.key for story in linked_stories if story.issue_type != "Bug"]
+
+        # Linked bugs first, then related bugs; dict keys dedupe in O(1) and keep order
+        fixed_by = dict.fromkeys(story.key for story in linked_stories if story.issue_type == "Bug")
+        fixed_by.update(dict.fromkeys(bug.key for bug in related_bugs))
+
+        return {
             "main": main_story.key,
             "depends_on": [],
             "blocks": [],
-            "relates_to": [],
-            "fixed_by": [],
+            "relates_to": relates_to,
+            "fixed_by": list(fixed_by),
             "components": main_story.components,
             "labels": main_story.labels,
         }
 
-        # Categorize linked issues (this is simplified - real implementation
-        # would check the link type)
-        for story in linked_stories:
-            if story.issue_type == "Bug":
-                graph["fixed_by"].append(story.key)
-            else:
-                graph["relates_to"].append(story.key)
-
-        # Add bug references
-        for bug in related_bugs:
-            if bug.key not in graph["fixed_by"]:
-                graph["fixed_by"].append(bug.key)
-
-        return graph
-
     def _build_full_context_text(self, context: StoryContext) -> str:
         """
         Build a comprehensive text representation of all context.
@@ -358,72 +534,79 @@ class StoryCollector:
             Full context as a formatted string
         """
         main_story = context.main_story
-        linked_stories = context.get("linked_stories", [])
-        related_bugs = context.get("related_bugs", [])
-        confluence_docs = context.get("confluence_docs", [])
-        subtasks = context.get("subtasks", [])
+        linked_stories = context.linked_stories
+        related_bugs = context.related_bugs
+        confluence_docs = context.confluence_docs
+        subtasks = context.subtasks
 
-        sections = []
+        # Stream everything into one buffer instead of collecting a list of lines
+        buf = io.StringIO()
+        write = buf.write
 
         # Main story section
-        sections.append("=== MAIN STORY ===")
-        sections.append(f"Key: {main_story.key}")
-        sections.append(f"Summary: {main_story.summary}")
-        sections.append(f"Type: {main_story.issue_type}")
-        sections.append(f"Priority: {main_story.priority}")
-        sections.append(f"Status: {main_story.status}")
+        write("=== MAIN STORY ===\n")
+        write(f"Key: {main_story.key}\n")
+        write(f"Summary: {main_story.summary}\n")
+        write(f"Type: {main_story.issue_type}\n")
+        write(f"Priority: {main_story.priority}\n")
+        write(f"Status: {main_story.status}\n")
 
         if main_story.description:
-            sections.append(f"\nDescription:\n{main_story.description}")
+            write("\nDescription:\n")
+            write(main_story.description)
+            write("\n")
 
         if main_story.acceptance_criteria:
-            sections.append(f"\nAcceptance Criteria:\n{main_story.acceptance_criteria}")
+            write("\nAcceptance Criteria:\n")
+            write(main_story.acceptance_criteria)
+            write("\n")
 
         if main_story.components:
-            sections.append(f"\nComponents: {', '.join(main_story.components)}")
+            components = ", ".join(main_story.components)
+            write(f"\nComponents: {components}\n")
 
         if main_story.labels:
-            sections.append(f"Labels: {', '.join(main_story.labels)}")
+            labels = ", ".join(main_story.labels)
+            write(f"Labels: {labels}\n")
 
         # Subtasks/Engineering Tasks section (NEW!)
         if subtasks:
-            sections.append("\n=== ENGINEERING TASKS / SUBTASKS ===")
-            sections.append("(These implementation details may suggest regression test scenarios)")
+            write("\n=== ENGINEERING TASKS / SUBTASKS ===\n")
+            write("(These implementation details may suggest regression test scenarios)\n")
             for task in subtasks[:10]:
-                sections.append(f"\n{task.key}: {task.summary}")
-                sections.append(f"Status: {task.status}")
+                write(f"\n{task.key}: {task.summary}\n")
+                write(f"Status: {task.status}\n")
                 if task.description:
-                    desc = task.description[:200] + "..." if len(task.description) > 200 else task.description
-                    sections.append(f"Details: {desc}")
+                    _write_truncated(buf, "Details: ", task.description, 200)
 
         # Linked stories section
         if linked_stories:
-            sections.append("\n=== LINKED STORIES ===")
+            write("\n=== LINKED STORIES ===\n")
             for story in linked_stories:
-                sections.append(f"\n{story.key}: {story.summary}")
-                sections.append(f"Type: {story.issue_type}, Status: {story.status}")
+                write(f"\n{story.key}: {story.summary}\n")
+                write(f"Type: {story.issue_type}, Status: {story.status}\n")
                 if story.description:
                     # Truncate long descriptions
-                    desc = story.description[:300] + "..." if len(story.description) > 300 else story.description
-                    sections.append(f"Description: {desc}")
+                    _write_truncated(buf, "Description: ", story.description, 300)
 
         # Related bugs section
         if related_bugs:
-            sections.append("\n=== RELATED BUGS ===")
+            write("\n=== RELATED BUGS ===\n")
             for bug in related_bugs[:10]:  # Limit to 10 bugs
-                sections.append(f"\n{bug.key}: {bug.summary}")
-                sections.append(f"Status: {bug.status}, Priority: {bug.priority}")
+                write(f"\n{bug.key}: {bug.summary}\n")
+                write(f"Status: {bug.status}, Priority: {bug.priority}\n")
 
         # Confluence documentation section (NEW!)
         if confluence_docs:
-            sections.append("\n=== RELATED DOCUMENTATION (PRD, TECH DESIGN) ===")
+            write("\n=== RELATED DOCUMENTATION (PRD, TECH DESIGN) ===\n")
             for doc in confluence_docs[:5]:  # Limit to 5 most relevant pages
-                sections.append(f"\n📄 {doc['title']}")
-                sections.append(f"URL: {doc['url']}")
-                if doc['content']:
+                write(f"\n📄 {doc.title}\n")
+                write(f"URL: {doc.url}\n")
+                if doc.content:
                     # Truncate long content
-                    content = doc['content'][:1000] + "..." if len(doc['content']) > 1000 else doc['content']
-                    sections.append(f"Content:\n{content}")
+                    _write_truncated(buf, "Content:\n", doc.content, 1000)
 
-        return "\n".join(sections)
+        # Drop the final newline so the text ends where the last section does
+        buf.truncate(buf.tell() - 1)
+        return buf.getvalue()
 
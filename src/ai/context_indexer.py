@@ -3,24 +3,84 @@ Context indexer for populating the RAG vector store with company-specific data.
 Indexes: test plans, Confluence docs, Jira stories, existing tests.
 """
 
-from typing import List, Dict, Optional, Any
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import asyncio
+import hashlib
 import json
+import threading
 from datetime import datetime
 
 from loguru import logger
 
+try:
+    from datasketch import MinHash, MinHashLSH
+    DATASKETCH_AVAILABLE = True
+except ImportError:
+    DATASKETCH_AVAILABLE = False
+
 from src.ai.rag_store import RAGVectorStore
 from src.models.test_plan import TestPlan
 from src.models.story import JiraStory
 from src.aggregator.story_collector import StoryContext
 
 
+def _short_id(value: Any) -> str:
+    """Compact, stable 32-char ID fragment for arbitrarily long keys or titles."""
+    return hashlib.blake2b(str(value).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _drop_near_duplicate_tests(
+    tests: List[Dict[str, Any]],
+    threshold: float = 0.95,
+    num_perm: int = 64
+) -> List[Dict[str, Any]]:
+    """
+    Drop tests whose name, objective and precondition nearly match an earlier test.
+    
+    Uses MinHash LSH over word 3-gram shingles, confirming each LSH candidate
+    by its estimated Jaccard similarity. Tests without an objective are always
+    kept, as a shared boilerplate precondition alone says nothing about what
+    they test. Returns the input unchanged if datasketch isn't installed.
+    """
+    if not DATASKETCH_AVAILABLE:
+        return tests
+    
+    lsh = MinHashLSH(threshold=threshold, num_perm=num_perm)
+    minhashes: Dict[str, MinHash] = {}
+    kept = []
+    for i, test in enumerate(tests):
+        if not test.get('objective'):
+            kept.append(test)
+            continue
+        
+        words = (
+            f"{test.get('name') or ''} {test['objective']} {test.get('precondition') or ''}"
+        ).lower().split()
+        minhash = MinHash(num_perm=num_perm)
+        for shingle in {" ".join(words[j:j + 3]) for j in range(max(len(words) - 2, 1))}:
+            minhash.update(shingle.encode('utf-8'))
+        
+        # LSH banding admits false positives; only skip confirmed near-duplicates
+        if any(minhashes[key].jaccard(minhash) >= threshold for key in lsh.query(minhash)):
+            continue
+        key = str(i)
+        lsh.insert(key, minhash)
+        minhashes[key] = minhash
+        kept.append(test)
+    return kept
+
+
 class ContextIndexer:
     """
     Indexes company-specific context into the RAG vector store.
     Enables semantic search and retrieval for test generation.
     """
     
+    # ChromaDB batch size limit
+    BATCH_SIZE = 1000
+    # Batches in flight at once (embedding of one overlaps the insert of another)
+    BATCH_CONCURRENCY = 2
+    
     def __init__(self):
         """Initialize context indexer with RAG store."""
         self.store = RAGVectorStore()
@@ -38,6 +98,10 @@ class ContextIndexer:
             test_plan: Generated test plan
             context: Story context used for generation
         """
+        if not self.store.enabled:
+            logger.warning("RAG vector store disabled, skipping test plan indexing")
+            return
+        
         logger.info(f"Indexing test plan for story {test_plan.story.key}")
         
         try:
@@ -47,7 +111,7 @@ class ContextIndexer:
             # Build metadata
             metadata = {
                 "story_key": test_plan.story.key,
-                "project_key": test_plan.story.key.split('-')[0],
+                "project_key": test_plan.story.key.partition('-')[0],
                 "summary": test_plan.story.summary[:200],
                 "components": ','.join(test_plan.story.components) if test_plan.story.components else '',
                 "test_count": len(test_plan.test_cases),
@@ -103,6 +167,70 @@ class ContextIndexer:
         
         return "\n".join(sections)
     
+    async def _index_batched(
+        self,
+        collection_name: str,
+        items: Sequence[Any],
+        build_doc: Callable[[Any], str],
+        build_meta: Callable[[Any], Dict[str, Any]],
+        build_id: Callable[[Any], str],
+        label: str
+    ) -> None:
+        """
+        Index items into a collection in batches of BATCH_SIZE.
+        
+        Args:
+            collection_name: Target collection
+            items: Items to index
+            build_doc: Builds the document text for an item
+            build_meta: Builds the metadata dict for an item
+            build_id: Builds the unique document ID for an item
+            label: Human-readable item type for logging (e.g. "Jira stories")
+        """
+        if not items:
+            logger.info("No {} to index", label)
+            return
+        
+        if not self.store.enabled:
+            logger.warning("RAG vector store disabled, skipping {} {}", len(items), label)
+            return
+        
+        logger.info("Indexing {} {}", len(items), label)
+        
+        total_batches = (len(items) - 1) // self.BATCH_SIZE + 1
+        semaphore = asyncio.Semaphore(self.BATCH_CONCURRENCY)
+        indexed = 0
+        batches_done = 0
+        
+        async def index_batch(batch_num: int, batch: Sequence[Any]) -> None:
+            nonlocal indexed, batches_done
+            try:
+                async with semaphore:
+                    await self.store.add_documents(
+                        collection_name=collection_name,
+                        documents=[build_doc(item) for item in batch],
+                        metadatas=[build_meta(item) for item in batch],
+                        ids=[build_id(item) for item in batch]
+                    )
+            except Exception as e:
+                # One failed batch shouldn't drop the others
+                logger.error("Failed to index {} (batch {}/{}): {}", label, batch_num, total_batches, e)
+                return
+            indexed += len(batch)
+            batches_done += 1
+            # Progress every 10 batches (and at the end) rather than per batch
+            if total_batches > 1 and (batches_done % 10 == 0 or batches_done == total_batches):
+                logger.info("Indexed {}/{} batches ({}/{} {})", batches_done, total_batches, indexed, len(items), label)
+        
+        # Overlap the next batch's embedding requests with the current batch's insert
+        await asyncio.gather(*(
+            index_batch(batch_num, items[start:start + self.BATCH_SIZE])
+            for batch_num, start in enumerate(range(0, len(items), self.BATCH_SIZE), 1)
+        ))
+        
+        if indexed:
+            logger.info("Successfully indexed {}/{} {}", indexed, len(items), label)
+    
     async def index_confluence_docs(
         self,
         docs: List[Dict[str, Any]],
@@ -116,67 +244,30 @@ class ContextIndexer:
             docs: List of Confluence document dicts (from story_collector)
             project_key: Optional project key for filtering
         """
-        if not docs:
-            logger.info("No Confluence docs to index")
-            return
+        now = datetime.now()
+        timestamp = now.isoformat()
+        date_suffix = now.strftime('%Y%m%d')
         
-        logger.info(f"Indexing {len(docs)} Confluence documents")
-        
-        # ChromaDB batch size limit
-        BATCH_SIZE = 1000
+        def build_meta(doc) -> Dict[str, Any]:
+            return {
+                "doc_id": str(doc.get('id', '')),
+                "title": str(doc.get('title', ''))[:200],
+                "space": str(doc.get('space', '')),
+                "url": str(doc.get('url', '')),
+                "project_key": str(project_key or 'unknown'),
+                "timestamp": timestamp
+            }
         
-        try:
-            total_indexed = 0
-            
-            # Process in batches
-            for i in range(0, len(docs), BATCH_SIZE):
-                batch = docs[i:i + BATCH_SIZE]
-                batch_num = (i // BATCH_SIZE) + 1
-                total_batches = (len(docs) - 1) // BATCH_SIZE + 1
-                
-                if len(docs) > BATCH_SIZE:
-                    logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} docs)")
-                
-                documents = []
-                metadatas = []
-                ids = []
-                
-                for doc in batch:
-                    # Build document text
-                    doc_text = f"Title: {doc.get('title', 'Unknown')}\n\n{doc.get('content', '')[:5000]}"
-                    documents.append(doc_text)
-                    
-                    # Build metadata
-                    metadata = {
-                        "doc_id": str(doc.get('id', '')),
-                        "title": str(doc.get('title', ''))[:200],
-                        "space": str(doc.get('space', '')),
-                        "url": str(doc.get('url', '')),
-                        "project_key": str(project_key or 'unknown'),
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    metadatas.append(metadata)
-                    
-                    # Generate unique ID
-                    doc_id = f"confluence_{doc.get('id', doc.get('title', 'unknown'))}_{datetime.now().strftime('%Y%m%d')}"
-                    ids.append(doc_id)
-                
-                # Add batch to vector store
-                await self.store.add_documents(
-                    collection_name=self.store.CONFLUENCE_DOCS_COLLECTION,
-                    documents=documents,
-                    metadatas=metadatas,
-                    ids=ids
-                )
-                
-                total_indexed += len(batch)
-                if len(docs) > BATCH_SIZE:
-                    logger.info(f"Indexed batch {batch_num}/{total_batches} ({total_indexed}/{len(docs)} total)")
-            
-            logger.info(f"Successfully indexed {len(docs)} Confluence documents")
-            
-        except Exception as e:
-            logger.error(f"Failed to index Confluence docs: {e}")
+        await self._index_batched(
+            self.store.CONFLUENCE_DOCS_COLLECTION,
+            docs,
+            build_doc=lambda doc: f"Title: {doc.get('title', 'Unknown')}\n\n{doc.get('content', '')[:5000]}",
+            build_meta=build_meta,
+            build_id=lambda doc: (
+                f"confluence_{_short_id(doc.get('id') or doc.get('title') or 'unknown')}_{date_suffix}"
+            ),
+            label="Confluence docs"
+        )
     
     async def index_jira_stories(
         self,
@@ -191,73 +282,35 @@ class ContextIndexer:
             stories: List of Jira stories
             project_key: Optional project key for filtering
         """
-        if not stories:
-            logger.info("No Jira stories to index")
-            return
+        timestamp = datetime.now().isoformat()
         
-        logger.info(f"Indexing {len(stories)} Jira stories")
+        def build_doc(story: JiraStory) -> str:
+            parts = [f"Story: {story.key} - {story.summary}\n\n"]
+            if story.description:
+                parts.append(f"Description: {story.description[:2000]}\n\n")
+            if hasattr(story, 'acceptance_criteria') and story.acceptance_criteria:
+                parts.append(f"Acceptance Criteria: {story.acceptance_criteria[:2000]}")
+            return "".join(parts)
         
-        # ChromaDB batch size limit
-        BATCH_SIZE = 1000
+        def build_meta(story: JiraStory) -> Dict[str, Any]:
+            return {
+                "story_key": story.key,
+                "project_key": project_key or story.key.partition('-')[0],
+                "summary": story.summary[:200],
+                "issue_type": story.issue_type,
+                "status": story.status,
+                "components": ','.join(story.components) if story.components else '',
+                "timestamp": timestamp
+            }
         
-        try:
-            total_indexed = 0
-            
-            # Process in batches
-            for i in range(0, len(stories), BATCH_SIZE):
-                batch = stories[i:i + BATCH_SIZE]
-                batch_num = (i // BATCH_SIZE) + 1
-                total_batches = (len(stories) - 1) // BATCH_SIZE + 1
-                
-                if len(stories) > BATCH_SIZE:
-                    logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} stories)")
-                
-                documents = []
-                metadatas = []
-                ids = []
-                
-                for story in batch:
-                    # Build document text
-                    doc_text = f"Story: {story.key} - {story.summary}\n\n"
-                    if story.description:
-                        doc_text += f"Description: {story.description[:2000]}\n\n"
-                    if hasattr(story, 'acceptance_criteria') and story.acceptance_criteria:
-                        doc_text += f"Acceptance Criteria: {story.acceptance_criteria[:2000]}"
-                    
-                    documents.append(doc_text)
-                    
-                    # Build metadata
-                    metadata = {
-                        "story_key": story.key,
-                        "project_key": project_key or story.key.split('-')[0],
-                        "summary": story.summary[:200],
-                        "issue_type": story.issue_type,
-                        "status": story.status,
-                        "components": ','.join(story.components) if story.components else '',
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    metadatas.append(metadata)
-                    
-                    # Generate unique ID
-                    doc_id = f"jira_{story.key}"
-                    ids.append(doc_id)
-                
-                # Add batch to vector store
-                await self.store.add_documents(
-                    collection_name=self.store.JIRA_STORIES_COLLECTION,
-                    documents=documents,
-                    metadatas=metadatas,
-                    ids=ids
-                )
-                
-                total_indexed += len(batch)
-                if len(stories) > BATCH_SIZE:
-                    logger.info(f"Indexed batch {batch_num}/{total_batches} ({total_indexed}/{len(stories)} total)")
-            
-            logger.info(f"Successfully indexed {len(stories)} Jira stories")
-            
-        except Exception as e:
-            logger.error(f"Failed to index Jira stories: {e}")
+        await self._index_batched(
+            self.store.JIRA_STORIES_COLLECTION,
+            stories,
+            build_doc=build_doc,
+            build_meta=build_meta,
+            build_id=lambda story: f"jira_{story.key}",
+            label="Jira stories"
+        )
     
     async def index_existing_tests(
         self,
@@ -272,79 +325,51 @@ class ContextIndexer:
             tests: List of existing test case dicts from Zephyr
             project_key: Project key for filtering
         """
-        if not tests:
-            logger.info("No existing tests to index")
-            return
+        unique_tests = _drop_near_duplicate_tests(tests)
+        if len(unique_tests) < len(tests):
+            logger.info(f"Skipping {len(tests) - len(unique_tests)} near-duplicate existing tests")
         
-        logger.info(f"Indexing {len(tests)} existing test cases")
+        now = datetime.now()
+        timestamp = now.isoformat()
+        date_suffix = now.strftime('%Y%m%d')
         
-        # ChromaDB batch size limit (be conservative)
-        BATCH_SIZE = 1000
+        def build_doc(test: Dict[str, Any]) -> str:
+            parts = [f"Test: {test.get('name', 'Unknown')}\n\n"]
+            if test.get('objective'):
+                parts.append(f"Objective: {test['objective'][:1000]}\n\n")
+            if test.get('precondition'):
+                parts.append(f"Precondition: {test['precondition'][:500]}")
+            return "".join(parts)
         
-        try:
-            total_indexed = 0
-            
-            # Process in batches
-            for i in range(0, len(tests), BATCH_SIZE):
-                batch = tests[i:i + BATCH_SIZE]
-                batch_num = (i // BATCH_SIZE) + 1
-                total_batches = (len(tests) - 1) // BATCH_SIZE + 1
-                
-                logger.info(f"Processing batch {batch_num}/{total_batches} ({len(batch)} tests)")
-                
-                documents = []
-                metadatas = []
-                ids = []
-                
-                for test in batch:
-                    # Build document text
-                    doc_text = f"Test: {test.get('name', 'Unknown')}\n\n"
-                    if test.get('objective'):
-                        doc_text += f"Objective: {test.get('objective', '')[:1000]}\n\n"
-                    if test.get('precondition'):
-                        doc_text += f"Precondition: {test.get('precondition', '')[:500]}"
-                    
-                    documents.append(doc_text)
-                    
-                    # Build metadata (ensure all values are primitives, not dicts)
-                    status = test.get('status', '')
-                    if isinstance(status, dict):
-                        status = status.get('name', '')
-                    
-                    priority = test.get('priority', '')
-                    if isinstance(priority, dict):
-                        priority = priority.get('name', '')
-                    
-                    metadata = {
-                        "test_key": str(test.get('key', '')),
-                        "test_name": str(test.get('name', ''))[:200],
-                        "project_key": str(project_key),
-                        "status": str(status),
-                        "priority": str(priority),
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    metadatas.append(metadata)
-                    
-                    # Generate unique ID
-                    test_key = test.get('key', test.get('name', 'unknown'))
-                    doc_id = f"test_{test_key}_{datetime.now().strftime('%Y%m%d')}"
-                    ids.append(doc_id)
-                
-                # Add batch to vector store
-                await self.store.add_documents(
-                    collection_name=self.store.EXISTING_TESTS_COLLECTION,
-                    documents=documents,
-                    metadatas=metadatas,
-                    ids=ids
-                )
-                
-                total_indexed += len(batch)
-                logger.info(f"Indexed batch {batch_num}/{total_batches} ({total_indexed}/{len(tests)} total)")
+        def build_meta(test: Dict[str, Any]) -> Dict[str, Any]:
+            # Ensure all values are primitives, not dicts
+            status = test.get('status', '')
+            if isinstance(status, dict):
+                status = status.get('name', '')
             
-            logger.info(f"Successfully indexed {len(tests)} existing tests in {total_batches} batches")
+            priority = test.get('priority', '')
+            if isinstance(priority, dict):
+                priority = priority.get('name', '')
             
-        except Exception as e:
-            logger.error(f"Failed to index existing tests: {e}")
+            return {
+                "test_key": str(test.get('key', '')),
+                "test_name": str(test.get('name', ''))[:200],
+                "project_key": str(project_key),
+                "status": str(status),
+                "priority": str(priority),
+                "timestamp": timestamp
+            }
+        
+        await self._index_batched(
+            self.store.EXISTING_TESTS_COLLECTION,
+            unique_tests,
+            build_doc=build_doc,
+            build_meta=build_meta,
+            build_id=lambda test: (
+                f"test_{_short_id(test.get('key') or test.get('name') or 'unknown')}_{date_suffix}"
+            ),
+            label="existing tests"
+        )
     
     async def index_story_context(
         self,
@@ -358,20 +383,52 @@ class ContextIndexer:
             context: Story context from story collector
             project_key: Project key for filtering
         """
+        if not self.store.enabled:
+            logger.warning("RAG vector store disabled, skipping story context indexing")
+            return
+        
         logger.info(f"Indexing full context for story {context.main_story.key}")
         
-        # Index Confluence docs
+        # Main story rides in the same batch as its linked stories
+        stories = [context.main_story]
+        stories.extend(s for s in context.get('linked_stories', []) if s.key != context.main_story.key)
+        
+        # Confluence docs and stories are independent, so embed and index them concurrently
+        tasks = [self.index_jira_stories(stories, project_key)]
+        labels = ["Jira stories"]
         confluence_docs = context.get('confluence_docs', [])
         if confluence_docs:
-            await self.index_confluence_docs(confluence_docs, project_key)
+            tasks.append(self.index_confluence_docs(confluence_docs, project_key))
+            labels.append("Confluence docs")
         
-        # Index linked stories
-        linked_stories = context.get('linked_stories', [])
-        if linked_stories:
-            await self.index_jira_stories(linked_stories, project_key)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
         
-        # Index main story
-        await self.index_jira_stories([context.main_story], project_key)
+        failed = False
+        for label, result in zip(labels, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to index {label} for {context.main_story.key}: {result}")
+                failed = True
         
-        logger.info(f"Successfully indexed context for {context.main_story.key}")
+        if not failed:
+            logger.info(f"Successfully indexed context for {context.main_story.key}")
+
+
+_indexer: Optional[ContextIndexer] = None
+_indexer_lock = threading.Lock()
+
 
+def get_indexer() -> ContextIndexer:
+    """
+    Get the process-wide ContextIndexer, creating it on first use.
+    
+    Building a ContextIndexer opens a Chroma client and an embedding service,
+    so callers share one instead of constructing a new one per request. An
+    indexer whose store came up disabled is rebuilt on the next call, so a
+    transient init failure doesn't disable indexing for the process lifetime.
+    """
+    global _indexer
+    if _indexer is None or not _indexer.store.enabled:
+        with _indexer_lock:
+            if _indexer is None or not _indexer.store.enabled:
+                _indexer = ContextIndexer()
+    return _indexer
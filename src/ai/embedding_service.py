@@ -3,12 +3,91 @@ Embedding service for converting text to vector embeddings.
 Supports OpenAI embeddings with batch processing.
 """
 
-from typing import List, Optional
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 import asyncio
+import hashlib
+import sqlite3
+import threading
+import weakref
+
+import numpy as np
 from loguru import logger
+from openai import AsyncOpenAI
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
 
 from src.config.settings import settings
 
+# Width of text-embedding-3-small vectors, used for zero-vector fallbacks
+EMBEDDING_DIMENSIONS = 1536
+
+# Input limits of the OpenAI embeddings endpoint: tokens per text, texts and
+# total tokens per request
+MAX_INPUT_TOKENS = 8191
+MAX_BATCH_TEXTS = 2048
+MAX_BATCH_TOKENS = 300_000
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by SHA-256 of model + text.
+    Vectors are stored as raw float32 bytes in a single SQLite table.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite file path
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        """Cache key for a text embedded with a given model."""
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Look up cached vectors.
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            Mapping of found keys to vectors
+        """
+        found: Dict[bytes, np.ndarray] = {}
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[bytes, np.ndarray]) -> None:
+        """Store vectors in one transaction."""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in items.items()],
+            )
+
 
 class EmbeddingService:
     """
@@ -16,16 +95,20 @@ class EmbeddingService:
     Handles batch processing and rate limiting.
     """
     
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        cache_path: Optional[str] = None
+    ):
         """
         Initialize embedding service.
         
         Args:
             api_key: OpenAI API key (defaults to settings)
             model: Embedding model (defaults to text-embedding-3-small)
+            cache_path: Embedding cache file (defaults to settings, empty disables caching)
         """
-        from openai import OpenAI
-        
         self.api_key = api_key or settings.openai_api_key
         self.model = model or settings.embedding_model
         
@@ -35,73 +118,196 @@ class EmbeddingService:
                 "OpenAI API key not configured. Please set OPENAI_API_KEY in .env or run 'womba configure'"
             )
         
-        # Initialize OpenAI client with minimal parameters for compatibility
-        self.client = OpenAI(api_key=self.api_key)
-        self.batch_size = 100  # OpenAI allows up to 2048 texts per request
+        # OpenAI clients per event loop (see client)
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.batch_size = MAX_BATCH_TEXTS
+        self.max_concurrency = 8  # Batch requests in flight at once
+        
+        # Tokenizer for client-side truncation (optional: without it, over-long
+        # texts are sent as-is and their batch may be rejected)
+        self._encoding = None
+        if TIKTOKEN_AVAILABLE:
+            try:
+                self._encoding = tiktoken.encoding_for_model(self.model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+        
+        cache_path = settings.embedding_cache_path if cache_path is None else cache_path
+        self.cache: Optional[EmbeddingCache] = None
+        if cache_path:
+            try:
+                self.cache = EmbeddingCache(cache_path)
+            except Exception as e:
+                logger.warning(f"Embedding cache disabled, could not open {cache_path}: {e}")
         
         logger.info(f"Initialized embedding service with model {self.model}")
+    
+    @property
+    def client(self) -> AsyncOpenAI:
+        """
+        OpenAI client for the running event loop.
         
-    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        The service is a process-wide singleton, but a client's connection pool
+        is bound to the loop that first used it and fails once that loop closes
+        (e.g. between CLI asyncio.run calls), so each loop gets its own.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = AsyncOpenAI(api_key=self.api_key)
+        return client
+        
+    async def embed_texts(
+        self,
+        texts: List[str],
+        quantize: bool = False
+    ) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
         """
         Generate embeddings for a list of texts with batch processing.
         
         Args:
             texts: List of text strings to embed
+            quantize: Return int8 vectors with per-vector scales instead of float32
             
         Returns:
-            List of embedding vectors
+            float32 array of shape (len(texts), dims), or (int8 vectors, scales) if quantize
         """
         if not texts:
-            return []
+            embeddings = np.empty((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+            return self.quantize(embeddings) if quantize else embeddings
+        
+        all_embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        
+        # Serve unchanged texts from the cache, only send unique misses to OpenAI
+        keys = [EmbeddingCache.key(self.model, text) for text in texts]
+        cached = self.cache.get_many(list(set(keys))) if self.cache else {}
+        pending: Dict[bytes, List[int]] = {}
+        for i, key in enumerate(keys):
+            vector = cached.get(key)
+            if vector is None:
+                pending.setdefault(key, []).append(i)
+            else:
+                all_embeddings[i] = vector
+        misses = list(pending)
+        
+        logger.info(
+            "Generating embeddings for {} texts using {} ({} cached or duplicate)",
+            len(misses), self.model, len(texts) - len(misses)
+        )
         
-        logger.info(f"Generating embeddings for {len(texts)} texts using {self.model}")
+        fresh: Dict[bytes, np.ndarray] = {}
         
-        all_embeddings = []
+        # Pack misses into the fewest requests that stay under both the text
+        # and the total-token limits
+        prepared = [self._prepare(texts[pending[key][0]]) for key in misses]
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for m, (_, n_tokens) in enumerate(prepared):
+            if current and (len(current) == self.batch_size or current_tokens + n_tokens > MAX_BATCH_TOKENS):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(m)
+            current_tokens += n_tokens
+        if current:
+            batches.append(current)
         
-        # Process in batches to handle rate limits
-        for i in range(0, len(texts), self.batch_size):
-            batch = texts[i:i + self.batch_size]
+        # Process in concurrent batches, bounded by a semaphore to respect rate limits
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def embed(batch_num: int, batch_misses: List[int]) -> None:
+            batch_keys = [misses[m] for m in batch_misses]
+            batch = [prepared[m][0] for m in batch_misses]
+            try:
+                async with semaphore:
+                    embeddings = await self._embed_batch(batch)
+            except Exception as e:
+                logger.error("Failed to embed batch {}: {}", batch_num, e)
+                # Failed embeddings stay None and become zero vectors (never cached)
+                return
             
+            for key, embedding in zip(batch_keys, embeddings):
+                fresh[key] = embedding
+                for j in pending[key]:
+                    all_embeddings[j] = embedding
+            logger.debug("Embedded batch {}/{}", batch_num, len(batches))
+        
+        await asyncio.gather(*(embed(n, batch) for n, batch in enumerate(batches, 1)))
+        
+        if fresh and self.cache:
             try:
-                # Run synchronous OpenAI call in executor to avoid blocking
-                embeddings = await asyncio.to_thread(self._embed_batch, batch)
-                all_embeddings.extend(embeddings)
-                
-                logger.debug(f"Embedded batch {i//self.batch_size + 1}/{(len(texts)-1)//self.batch_size + 1}")
-                
+                self.cache.put_many(fresh)
             except Exception as e:
-                logger.error(f"Failed to embed batch {i//self.batch_size + 1}: {e}")
-                # Return zero vectors for failed embeddings
-                all_embeddings.extend([[0.0] * 1536] * len(batch))
+                logger.warning(f"Failed to write embedding cache: {e}")
+        
+        dims = next((len(v) for v in all_embeddings if v is not None), EMBEDDING_DIMENSIONS)
+        zero = np.zeros(dims, dtype=np.float32)
+        embeddings = np.vstack([zero if v is None else v for v in all_embeddings])
+        
+        logger.info("Successfully generated {} embeddings", len(embeddings))
+        return self.quantize(embeddings) if quantize else embeddings
+    
+    def _prepare(self, text: str) -> Tuple[str, int]:
+        """
+        Trim text to the model's token limit so OpenAI never rejects it for length.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Tuple of the text cut to at most MAX_INPUT_TOKENS tokens and its token
+            count (without tiktoken: the text unchanged and a ~4 chars/token estimate)
+        """
+        if self._encoding is None:
+            return text, len(text) // 4 + 1
+        
+        tokens = self._encoding.encode(text, disallowed_special=())
+        if len(tokens) <= MAX_INPUT_TOKENS:
+            return text, len(tokens)
+        return self._encoding.decode(tokens[:MAX_INPUT_TOKENS]), MAX_INPUT_TOKENS
+    
+    @staticmethod
+    def quantize(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scalar-quantize float vectors to int8 with one scale per vector.
         
-        logger.info(f"Successfully generated {len(all_embeddings)} embeddings")
-        return all_embeddings
+        Args:
+            embeddings: float array of shape (n, dims)
+            
+        Returns:
+            Tuple of int8 vectors and float32 scales; vectors[i] * scales[i] approximates the input
+        """
+        scales = np.abs(embeddings).max(axis=1, initial=0.0) / 127
+        scales[scales == 0] = 1.0
+        quantized = np.round(embeddings / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
     
-    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+    async def _embed_batch(self, texts: List[str]) -> np.ndarray:
         """
-        Synchronously embed a batch of texts.
+        Embed a batch of texts.
         
         Args:
             texts: Batch of texts to embed
             
         Returns:
-            List of embedding vectors
+            float32 array of embedding vectors
         """
         try:
-            response = self.client.embeddings.create(
+            response = await self.client.embeddings.create(
                 model=self.model,
                 input=texts
             )
             
             # Extract embeddings in order
-            embeddings = [item.embedding for item in response.data]
-            return embeddings
+            return np.asarray([item.embedding for item in response.data], dtype=np.float32)
             
         except Exception as e:
             logger.error(f"OpenAI embedding error: {e}")
             raise
     
-    async def embed_single(self, text: str) -> List[float]:
+    async def embed_single(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text.
         
@@ -111,6 +317,23 @@ class EmbeddingService:
         Returns:
             Embedding vector
         """
-        embeddings = await self.embed_texts([text])
-        return embeddings[0] if embeddings else [0.0] * 1536
+        return (await self.embed_texts([text]))[0]
+
+
+_embedding_service: Optional[EmbeddingService] = None
+_embedding_service_lock = threading.Lock()
 
+
+def get_embedding_service() -> EmbeddingService:
+    """
+    Get the process-wide EmbeddingService, creating it on first use.
+    
+    Sharing one instance reuses its OpenAI connection pool, tokenizer and
+    cache connection instead of rebuilding them for every store.
+    """
+    global _embedding_service
+    if _embedding_service is None:
+        with _embedding_service_lock:
+            if _embedding_service is None:
+                _embedding_service = EmbeddingService()
+    return _embedding_service
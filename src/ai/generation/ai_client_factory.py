@@ -1,10 +1,46 @@
 """
 AI Client Factory - creates OpenAI or Anthropic clients.
 """
-from typing import Optional
+import asyncio
+import weakref
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
 from src.config.settings import settings
 
 
+@lru_cache(maxsize=4)
+def _make_client(kind: str, api_key: Optional[str]):
+    """Build one client per (provider, API key) and reuse its connection pool."""
+    if kind == "openai":
+        from openai import OpenAI
+        return OpenAI(api_key=api_key)
+    from anthropic import Anthropic
+    return Anthropic(api_key=api_key)
+
+
+# Async clients per event loop: their httpx pools are bound to the loop that
+# first used them and fail with "Event loop is closed" after it ends
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, Optional[str]], Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _make_async_client(kind: str, api_key: Optional[str]):
+    """Async counterpart of _make_client, shared per (provider, API key) on the running loop."""
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get((kind, api_key))
+    if client is None:
+        if kind == "openai":
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=api_key)
+        else:
+            from anthropic import AsyncAnthropic
+            client = AsyncAnthropic(api_key=api_key)
+        clients[(kind, api_key)] = client
+    return client
+
+
 class AIClientFactory:
     """Factory for creating AI clients (OpenAI or Anthropic)."""
     
@@ -13,6 +49,9 @@ class AIClientFactory:
         """
         Create an AI client.
         
+        Clients are cached per provider and API key, so repeated calls share
+        one HTTP connection pool instead of building a new client each time.
+        
         Args:
             use_openai: Use OpenAI (True) or Anthropic (False)
             api_key: API key (defaults to settings)
@@ -21,11 +60,29 @@ class AIClientFactory:
             OpenAI or Anthropic client instance
         """
         if use_openai:
-            from openai import OpenAI
-            return OpenAI(api_key=api_key or settings.openai_api_key)
+            return _make_client("openai", api_key or settings.openai_api_key)
+        else:
+            return _make_client("anthropic", api_key or settings.anthropic_api_key)
+    
+    @staticmethod
+    def create_async_client(use_openai: bool = True, api_key: Optional[str] = None):
+        """
+        Create an async AI client, cached per provider and API key like create_client.
+        
+        Must be called from a running event loop; each loop gets its own
+        clients, so call this where the client is used rather than holding one.
+        
+        Args:
+            use_openai: Use OpenAI (True) or Anthropic (False)
+            api_key: API key (defaults to settings)
+            
+        Returns:
+            AsyncOpenAI or AsyncAnthropic client instance
+        """
+        if use_openai:
+            return _make_async_client("openai", api_key or settings.openai_api_key)
         else:
-            from anthropic import Anthropic
-            return Anthropic(api_key=api_key or settings.anthropic_api_key)
+            return _make_async_client("anthropic", api_key or settings.anthropic_api_key)
     
     @staticmethod
     def get_default_model(use_openai: bool = True) -> str:
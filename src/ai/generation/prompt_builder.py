@@ -1,6 +1,9 @@
 """
 Prompt builder that uses existing QA-focused prompts.
 """
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
+
 from src.ai.prompts_qa_focused import (
     EXPERT_QA_SYSTEM_PROMPT,
     BUSINESS_CONTEXT_PROMPT,
@@ -12,18 +15,55 @@ from src.ai.prompts_qa_focused import (
 # Use existing prompts - no need for REWRITTEN_PROMPT
 REWRITTEN_PROMPT = USER_FLOW_GENERATION_PROMPT
 
+
+def _compile_template(template: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    Split a str.format template into (literal, field_name) pairs once.
+    
+    Only plain {name} placeholders are supported; {{ and }} are unescaped
+    in the literals, as str.format would.
+    
+    Raises:
+        ValueError: If a placeholder is positional or has a format spec or
+            conversion, which _render would otherwise silently ignore
+    """
+    parts = []
+    for literal, field, format_spec, conversion in Formatter().parse(template):
+        if field is not None and (not field or format_spec or conversion):
+            raise ValueError(f"Unsupported template placeholder {field!r}: only plain {{name}} fields are allowed")
+        parts.append((literal, field))
+    return parts
+
+
+def _render(parts: List[Tuple[str, Optional[str]]], values: Dict[str, Any]) -> str:
+    """
+    Fill a compiled template.
+    
+    Raises:
+        KeyError: If a placeholder has no value, as str.format would
+    """
+    return "".join(
+        literal if field is None else literal + str(values[field])
+        for literal, field in parts
+    )
+
+
+# USER_FLOW_GENERATION_PROMPT is large, so parse it once at import instead of on every build
+_USER_FLOW_PARTS = _compile_template(USER_FLOW_GENERATION_PROMPT)
+
+
 class PromptBuilder:
     """Builds prompts for test plan generation using existing QA-focused prompts."""
     
     @staticmethod
     def build_prompt(context: str, business_context: str = "", **kwargs) -> str:
         """Build a prompt using existing prompts."""
-        return USER_FLOW_GENERATION_PROMPT.format(
-            business_context=business_context or BUSINESS_CONTEXT_PROMPT,
-            management_api_context=MANAGEMENT_API_CONTEXT,
-            context=context,
-            existing_tests_context=kwargs.get('existing_tests_context', ''),
-            tasks_context=kwargs.get('tasks_context', ''),
-            folder_context=kwargs.get('folder_context', ''),
-            figma_context=kwargs.get('figma_context', ''),
-        )
+        return _render(_USER_FLOW_PARTS, {
+            'business_context': business_context or BUSINESS_CONTEXT_PROMPT,
+            'management_api_context': MANAGEMENT_API_CONTEXT,
+            'context': context,
+            'existing_tests_context': kwargs.get('existing_tests_context', ''),
+            'tasks_context': kwargs.get('tasks_context', ''),
+            'folder_context': kwargs.get('folder_context', ''),
+            'figma_context': kwargs.get('figma_context', ''),
+        })
@@ -0,0 +1,76 @@
+"""
+Persistent cache of LLM responses keyed by the exact request sent.
+"""
+
+from pathlib import Path
+from typing import Dict, Optional
+import hashlib
+import sqlite3
+import threading
+
+
+class PromptCache:
+    """
+    LLM response cache keyed by SHA-256 of model, sampling parameters and prompts.
+    Only exact matches hit: any change to the story, context or settings
+    produces a different rendered prompt and therefore a miss.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite file path
+        """
+        Path(path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(Path(path).expanduser()), check_same_thread=False)
+        # Callers read and write from worker threads; one statement at a time per connection
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key BLOB PRIMARY KEY, response TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, temperature: float, max_tokens: int, system: str, prompt: str) -> bytes:
+        """Cache key for one LLM request."""
+        digest = hashlib.sha256()
+        for part in (model, repr(temperature), str(max_tokens), system, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        """Return the cached response text, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: bytes, response: str) -> None:
+        """Store a response."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response) VALUES (?, ?)", (key, response)
+            )
+
+
+_prompt_caches: Dict[str, PromptCache] = {}
+_prompt_caches_lock = threading.Lock()
+
+
+def get_prompt_cache(path: str) -> PromptCache:
+    """
+    Get the process-wide PromptCache for a path, opening it on first use.
+    
+    Generators are built per request, so sharing one cache per file keeps a
+    single SQLite connection instead of opening (and leaking) one per generator.
+    """
+    key = str(Path(path).expanduser().resolve())
+    cache = _prompt_caches.get(key)
+    if cache is None:
+        with _prompt_caches_lock:
+            cache = _prompt_caches.get(key)
+            if cache is None:
+                cache = _prompt_caches[key] = PromptCache(path)
+    return cache
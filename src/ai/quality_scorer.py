@@ -2,12 +2,66 @@
 Test quality scoring system to measure test specificity and relevance.
 """
 
-from typing import List
+from functools import lru_cache
+from typing import FrozenSet, List, NamedTuple, Tuple
+import hashlib
+
+import numpy as np
+from cachetools import LRUCache
 from loguru import logger
 
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 from src.models.test_case import TestCase
 from src.models.story import JiraStory
-from src.utils.text_processor import extract_keywords, calculate_text_similarity
+from src.utils.text_processor import extract_keywords
+
+
+# Specific-indicator keywords by category (matched as plain substrings)
+_INDICATOR_KEYWORDS = {
+    'api': ('post', 'get', 'put', 'delete', 'patch', 'endpoint', 'api', '/v1/', 'http'),
+    'ui': ('click', 'verify', 'navigate', 'button', 'tab', 'screen', 'dialog', 'menu'),
+    'validation': ('expect', 'assert', 'check', 'confirm', 'validate', 'ensure')
+}
+
+# Markers of inline test data in descriptions and step actions
+_INLINE_DATA_INDICATORS = (
+    '{', '}',  # JSON
+    'id:', 'name:', 'type:',  # Key-value pairs
+    '=',  # Assignments
+    '"', "'"  # Strings
+)
+
+# One bit per indicator category; found categories are OR-ed into a mask
+_INDICATOR_BITS = {category: 1 << i for i, category in enumerate(_INDICATOR_KEYWORDS)}
+
+# Indicator points by number of categories found (capped at two)
+_INDICATOR_SCORES = (0.0, 15.0, 25.0, 25.0)
+
+# One Aho-Corasick automaton over all indicator keywords, mapping each to its
+# category bit; finds every category in a single pass over the text
+_INDICATOR_AUTOMATON = None
+if AHOCORASICK_AVAILABLE:
+    _INDICATOR_AUTOMATON = ahocorasick.Automaton()
+    for _category, _keywords in _INDICATOR_KEYWORDS.items():
+        for _keyword in _keywords:
+            _INDICATOR_AUTOMATON.add_word(_keyword, _INDICATOR_BITS[_category])
+    _INDICATOR_AUTOMATON.make_automaton()
+
+
+class _StoryContext(NamedTuple):
+    """Per-story data shared by every test case scored against that story."""
+    keywords: FrozenSet[str]
+
+
+@lru_cache(maxsize=64)
+def _story_context_for(summary: str) -> _StoryContext:
+    """Story context by summary, so per-test calls don't re-tokenize the same story."""
+    return _StoryContext(keywords=frozenset(extract_keywords(summary, min_length=4)))
 
 
 class TestQualityScorer:
@@ -23,6 +77,27 @@ class TestQualityScorer:
     
     def __init__(self):
         self.min_passing_score = 60.0
+        # Full scores keyed by (test case content digest, story context), so
+        # re-scoring the same tests for filtering and reporting is free
+        self._score_cache: LRUCache = LRUCache(maxsize=4096)
+    
+    def clear_cache(self) -> None:
+        """Drop all memoized scores."""
+        self._score_cache.clear()
+    
+    @staticmethod
+    def _cache_key(test_case: TestCase, ctx: _StoryContext) -> Tuple[bytes, _StoryContext]:
+        """Key a test case by a digest of the fields that affect its score."""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (test_case.title, test_case.description):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        for step in test_case.steps:
+            for part in (step.action, step.expected_result, step.test_data or ""):
+                digest.update(part.encode("utf-8"))
+                digest.update(b"\x00")
+            digest.update(b"\x01")
+        return digest.digest(), ctx
     
     def score_test_case(self, test_case: TestCase, story: JiraStory) -> float:
         """
@@ -35,10 +110,23 @@ class TestQualityScorer:
         Returns:
             Score between 0-100
         """
+        return self._score_test_case(test_case, self._prepare_story_context(story))
+    
+    def _prepare_story_context(self, story: JiraStory) -> _StoryContext:
+        """Extract story keywords once so a whole plan can be scored against them."""
+        return _story_context_for(story.summary)
+    
+    def _score_test_case(self, test_case: TestCase, ctx: _StoryContext) -> float:
+        """Score a test case against precomputed story context."""
+        key = self._cache_key(test_case, ctx)
+        cached = self._score_cache.get(key)
+        if cached is not None:
+            return cached
+        
         score = 0.0
         
         # 1. Feature name mentioned (30 points)
-        feature_score = self._score_feature_specificity(test_case, story)
+        feature_score = self._score_feature_specificity(test_case, ctx)
         score += feature_score
         
         # 2. Has 3+ detailed steps (20 points)
@@ -59,6 +147,7 @@ class TestQualityScorer:
             f"indicators:{indicator_score:.1f}, data:{data_score:.1f})"
         )
         
+        self._score_cache[key] = score
         return score
     
     def score_test_plan(
@@ -76,15 +165,18 @@ class TestQualityScorer:
         Returns:
             Dictionary with scoring details
         """
-        scores = [self.score_test_case(tc, story) for tc in test_cases]
+        ctx = self._prepare_story_context(story)
+        scores = [self._score_test_case(tc, ctx) for tc in test_cases]
         
-        avg_score = sum(scores) / len(scores) if scores else 0.0
-        passing_tests = sum(1 for s in scores if s >= self.min_passing_score)
+        # Aggregate in one array; individual_scores stays a plain list for JSON
+        arr = np.fromiter(scores, dtype=np.float64, count=len(scores))
+        avg_score = float(arr.mean()) if scores else 0.0
+        passing_tests = int((arr >= self.min_passing_score).sum())
         
         result = {
             "average_score": avg_score,
-            "min_score": min(scores) if scores else 0.0,
-            "max_score": max(scores) if scores else 0.0,
+            "min_score": float(arr.min()) if scores else 0.0,
+            "max_score": float(arr.max()) if scores else 0.0,
             "passing_tests": passing_tests,
             "total_tests": len(test_cases),
             "pass_rate": passing_tests / len(test_cases) if test_cases else 0.0,
@@ -98,30 +190,23 @@ class TestQualityScorer:
         
         return result
     
-    def _score_feature_specificity(self, test_case: TestCase, story: JiraStory) -> float:
+    def _score_feature_specificity(self, test_case: TestCase, ctx: _StoryContext) -> float:
         """
         Score whether test mentions the specific feature (30 points).
         """
-        # Extract feature name from story
-        feature_keywords = extract_keywords(story.summary, min_length=4)
-        
         # Check if test mentions feature
         test_text = f"{test_case.title} {test_case.description}".lower()
         
-        matches = sum(1 for kw in feature_keywords if kw in test_text)
+        matches = sum(1 for kw in ctx.keywords if kw in test_text)
         
         if matches >= 2:
             return 30.0  # Mentions multiple feature keywords
         elif matches == 1:
             return 20.0  # Mentions one keyword
         
-        # Check for similarity as fallback
-        similarity = calculate_text_similarity(
-            story.summary,
-            test_case.title + " " + test_case.description
-        )
-        
-        return similarity * 30.0
+        # No keyword-overlap fallback: test keywords are words of test_text, so
+        # with no story keyword in the text their overlap (and similarity) is zero
+        return 0.0
     
     def _score_step_completeness(self, test_case: TestCase) -> float:
         """
@@ -149,61 +234,39 @@ class TestQualityScorer:
         - UI: Click, Verify, Navigate, Button, Tab, Screen
         - Data: Expect, Assert, Check, Confirm
         """
-        indicators = {
-            'api': ['post', 'get', 'put', 'delete', 'patch', 'endpoint', 'api', '/v1/', 'http'],
-            'ui': ['click', 'verify', 'navigate', 'button', 'tab', 'screen', 'dialog', 'menu'],
-            'validation': ['expect', 'assert', 'check', 'confirm', 'validate', 'ensure']
-        }
-        
-        test_text = f"{test_case.title} {test_case.description}".lower()
-        
-        # Add step text
+        # Title, description and step text, joined and lowered in one pass
+        parts = [test_case.title, test_case.description]
         for step in test_case.steps:
-            test_text += f" {step.action} {step.expected_result}".lower()
-        
-        score = 0.0
-        found_categories = set()
-        
-        for category, keywords in indicators.items():
-            if any(kw in test_text for kw in keywords):
-                found_categories.add(category)
-        
-        # Award points based on categories found
-        if len(found_categories) >= 2:
-            score = 25.0  # Uses multiple types of indicators
-        elif len(found_categories) == 1:
-            score = 15.0  # Uses one type
-        
-        return score
+            parts.append(step.action)
+            parts.append(step.expected_result)
+        test_text = " ".join(parts).lower()
+        
+        mask = 0
+        if _INDICATOR_AUTOMATON is not None:
+            for _, bit in _INDICATOR_AUTOMATON.iter(test_text):
+                mask |= bit
+                if mask & (mask - 1):
+                    break  # Two categories found, score is already at its maximum
+        else:
+            for category, keywords in _INDICATOR_KEYWORDS.items():
+                if any(kw in test_text for kw in keywords):
+                    mask |= _INDICATOR_BITS[category]
+        
+        # 25 points for multiple types of indicators, 15 for one type
+        return _INDICATOR_SCORES[mask.bit_count()]
     
     def _score_test_data(self, test_case: TestCase) -> float:
         """
         Score based on presence of realistic test data (25 points).
         """
-        has_data = False
-        
         # Check steps for test data
-        for step in test_case.steps:
-            if step.test_data and len(str(step.test_data)) > 0:
-                has_data = True
-                break
-        
-        if has_data:
+        if any(step.test_data for step in test_case.steps):
             return 25.0
         
         # Check for inline data in descriptions
-        inline_indicators = [
-            '{', '}',  # JSON
-            'id:', 'name:', 'type:',  # Key-value pairs
-            '=',  # Assignments
-            '"', "'"  # Strings
-        ]
+        test_text = " ".join([test_case.description, *(step.action for step in test_case.steps)])
         
-        test_text = f"{test_case.description}"
-        for step in test_case.steps:
-            test_text += f" {step.action}"
-        
-        if any(ind in test_text for ind in inline_indicators):
+        if any(ind in test_text for ind in _INLINE_DATA_INDICATORS):
             return 15.0  # Has some inline data
         
         return 0.0
@@ -219,8 +282,42 @@ class TestQualityScorer:
         Returns:
             True if test passes quality check
         """
-        score = self.score_test_case(test_case, story)
-        return score >= self.min_passing_score
+        return self._is_acceptable(test_case, self._prepare_story_context(story))
+    
+    def _is_acceptable(self, test_case: TestCase, ctx: _StoryContext) -> bool:
+        """Threshold check against precomputed story context."""
+        return self._score_incremental(test_case, ctx, self.min_passing_score) >= self.min_passing_score
+    
+    def _score_incremental(self, test_case: TestCase, ctx: _StoryContext, threshold: float) -> float:
+        """
+        Score components cheapest-first, stopping once the outcome is decided.
+        
+        Returns the partial score as soon as it reaches threshold, or as soon as
+        the points still available can no longer lift it there. Only the
+        pass/fail outcome matches score_test_case, not the number itself.
+        A memoized full score is used when there is one.
+        """
+        cached = self._score_cache.get(self._cache_key(test_case, ctx))
+        if cached is not None:
+            return cached
+        
+        # (scorer, max points) in order of increasing cost
+        components = (
+            (self._score_step_completeness, 20.0),
+            (self._score_test_data, 25.0),
+            (self._score_specific_indicators, 25.0),
+            (lambda tc: self._score_feature_specificity(tc, ctx), 30.0),
+        )
+        
+        score = 0.0
+        remaining = sum(max_points for _, max_points in components)
+        for scorer, max_points in components:
+            score += scorer(test_case)
+            remaining -= max_points
+            if score >= threshold or score + remaining < threshold:
+                break
+        
+        return score
     
     def filter_low_quality_tests(
         self,
@@ -237,9 +334,10 @@ class TestQualityScorer:
         Returns:
             List of high-quality tests only
         """
+        ctx = self._prepare_story_context(story)
         filtered = [
             tc for tc in test_cases
-            if self.is_test_acceptable(tc, story)
+            if self._is_acceptable(tc, ctx)
         ]
         
         removed = len(test_cases) - len(filtered)
@@ -5,13 +5,23 @@ Retrieves similar test plans, docs, stories, and tests for grounded generation.
 
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
+import asyncio
+import hashlib
+import re
+import threading
 
+import numpy as np
 from loguru import logger
 
+from src.ai.embedding_service import EMBEDDING_DIMENSIONS
 from src.ai.rag_store import RAGVectorStore
 from src.models.story import JiraStory
 from src.config.settings import settings
 
+# Markup and whitespace runs add embedding tokens without adding meaning
+_TAG_RE = re.compile(r'<[^>]+>')
+_WHITESPACE_RE = re.compile(r'\s+')
+
 
 @dataclass
 class RetrievedContext:
@@ -53,6 +63,17 @@ class RAGRetriever:
         self.top_k_docs = settings.rag_top_k_docs
         self.top_k_stories = settings.rag_top_k_stories
         self.top_k_existing = settings.rag_top_k_existing
+        
+        # Retrievals in progress, keyed by project and query
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+        
+        # (collection, top_k, label) per RetrievedContext field, in field order
+        self._collections = (
+            (self.store.TEST_PLANS_COLLECTION, self.top_k_tests, "test plans"),
+            (self.store.CONFLUENCE_DOCS_COLLECTION, self.top_k_docs, "Confluence docs"),
+            (self.store.JIRA_STORIES_COLLECTION, self.top_k_stories, "Jira stories"),
+            (self.store.EXISTING_TESTS_COLLECTION, self.top_k_existing, "existing tests"),
+        )
         logger.info("Initialized RAG retriever")
     
     async def retrieve_for_story(
@@ -74,49 +95,94 @@ class RAGRetriever:
         
         # Extract project key
         if not project_key:
-            project_key = story.key.split('-')[0]
+            project_key = story.key.partition('-')[0]
         
         # Build query from story
         query = self._build_query(story)
         
-        # Metadata filter for project
-        metadata_filter = {"project_key": project_key}
+        # Metadata filter for project (none if the key yields no project)
+        metadata_filter = {"project_key": project_key} if project_key else None
         
-        # Retrieve from all collections in parallel
-        import asyncio
+        if not self.store.enabled:
+            logger.info("RAG vector store disabled, skipping retrieval")
+            return RetrievedContext([], [], [], [])
+        
+        # Too little text for a meaningful semantic match
+        if len(query.strip()) < settings.rag_min_query_chars:
+            logger.info(f"RAG query for {story.key} too short, skipping retrieval")
+            return RetrievedContext([], [], [], [])
+        
+        # Concurrent retrievals of the same query share one in-flight search
+        key = hashlib.sha256(f"{project_key}\x00{query}".encode("utf-8")).digest()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._retrieve(query, metadata_filter, story.key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            logger.info(f"Joining in-flight RAG retrieval for {story.key}")
+        
+        # Shielded so one caller's cancellation doesn't cancel the others
+        return await asyncio.shield(task)
+    
+    async def _retrieve(
+        self,
+        query: str,
+        metadata_filter: Optional[Dict[str, Any]],
+        story_key: str
+    ) -> RetrievedContext:
+        """Embed the query and search all collections with it."""
+        # Embed the query once and search every collection with the same vector
+        try:
+            query_embedding = await self.store.embed_query(query)
+        except Exception as e:
+            logger.error(f"Failed to embed RAG query for {story_key}: {e}")
+            return RetrievedContext([], [], [], [])
         
-        similar_test_plans, similar_docs, similar_stories, similar_tests = await asyncio.gather(
-            self._retrieve_similar_test_plans(query, metadata_filter),
-            self._retrieve_similar_confluence_docs(query, metadata_filter),
-            self._retrieve_similar_jira_stories(query, metadata_filter),
-            self._retrieve_similar_existing_tests(query, metadata_filter),
+        # Retrieve from all collections in parallel
+        results = await asyncio.gather(
+            *(
+                self.store.retrieve_similar_by_vector(
+                    collection_name=collection_name,
+                    query_embedding=query_embedding,
+                    top_k=top_k,
+                    metadata_filter=metadata_filter
+                )
+                for collection_name, top_k, _ in self._collections
+            ),
             return_exceptions=True
         )
         
         # Handle exceptions
-        if isinstance(similar_test_plans, Exception):
-            logger.error(f"Failed to retrieve test plans: {similar_test_plans}")
-            similar_test_plans = []
-        if isinstance(similar_docs, Exception):
-            logger.error(f"Failed to retrieve docs: {similar_docs}")
-            similar_docs = []
-        if isinstance(similar_stories, Exception):
-            logger.error(f"Failed to retrieve stories: {similar_stories}")
-            similar_stories = []
-        if isinstance(similar_tests, Exception):
-            logger.error(f"Failed to retrieve tests: {similar_tests}")
-            similar_tests = []
-        
-        context = RetrievedContext(
-            similar_test_plans=similar_test_plans,
-            similar_confluence_docs=similar_docs,
-            similar_jira_stories=similar_stories,
-            similar_existing_tests=similar_tests
-        )
+        for i, (_, _, label) in enumerate(self._collections):
+            if isinstance(results[i], Exception):
+                logger.warning(f"No similar {label} found: {results[i]}")
+                results[i] = []
+            else:
+                logger.info(f"Retrieved {len(results[i])} similar {label}")
+        
+        context = RetrievedContext(*results)
         
         logger.info(context.get_summary())
         return context
     
+    async def warmup(self) -> None:
+        """
+        Open every collection and run a throwaway query against each, so the
+        first real retrieval doesn't pay for loading the HNSW indexes.
+        """
+        if not self.store.enabled:
+            return
+        
+        probe = np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32)
+        probe[0] = 1.0  # Unit vector; a zero vector has no cosine distance
+        
+        await asyncio.gather(*(
+            self.store.retrieve_similar_by_vector(collection_name, probe, top_k=1)
+            for collection_name, _, _ in self._collections
+        ))
+        logger.info("Warmed up RAG collections")
+    
     def _build_query(self, story: JiraStory) -> str:
         """
         Build search query from story.
@@ -131,111 +197,30 @@ class RAGRetriever:
         query_parts = [story.summary]
         
         if story.description:
-            # Take first 500 chars of description
-            query_parts.append(story.description[:500])
+            # Take first 500 chars of the description once markup is stripped
+            description = _WHITESPACE_RE.sub(' ', _TAG_RE.sub(' ', story.description)).strip()
+            query_parts.append(description[:500])
         
         if story.components:
             query_parts.append(f"Components: {', '.join(story.components)}")
         
         return "\n".join(query_parts)
-    
-    async def _retrieve_similar_test_plans(
-        self,
-        query: str,
-        metadata_filter: Dict[str, Any]
-    ) -> List[Dict[str, Any]]:
-        """Retrieve similar past test plans."""
-        try:
-            # Check if collection has documents
-            stats = self.store.get_collection_stats(self.store.TEST_PLANS_COLLECTION)
-            if stats.get('count', 0) == 0:
-                logger.info("Test plans collection is empty, skipping retrieval")
-                return []
-            
-            results = await self.store.retrieve_similar(
-                collection_name=self.store.TEST_PLANS_COLLECTION,
-                query_text=query,
-                top_k=self.top_k_tests,
-                metadata_filter=metadata_filter
-            )
-            logger.info(f"Retrieved {len(results)} similar test plans")
-            return results
-        except Exception as e:
-            logger.warning(f"No similar test plans found: {e}")
-            return []
-    
-    async def _retrieve_similar_confluence_docs(
-        self,
-        query: str,
-        metadata_filter: Dict[str, Any]
-    ) -> List[Dict[str, Any]]:
-        """Retrieve similar Confluence documentation."""
-        try:
-            # Check if collection has documents
-            stats = self.store.get_collection_stats(self.store.CONFLUENCE_DOCS_COLLECTION)
-            if stats.get('count', 0) == 0:
-                logger.info("Confluence docs collection is empty, skipping retrieval")
-                return []
-            
-            results = await self.store.retrieve_similar(
-                collection_name=self.store.CONFLUENCE_DOCS_COLLECTION,
-                query_text=query,
-                top_k=self.top_k_docs,
-                metadata_filter=metadata_filter
-            )
-            logger.info(f"Retrieved {len(results)} similar Confluence docs")
-            return results
-        except Exception as e:
-            logger.warning(f"No similar Confluence docs found: {e}")
-            return []
-    
-    async def _retrieve_similar_jira_stories(
-        self,
-        query: str,
-        metadata_filter: Dict[str, Any]
-    ) -> List[Dict[str, Any]]:
-        """Retrieve similar Jira stories."""
-        try:
-            # Check if collection has documents
-            stats = self.store.get_collection_stats(self.store.JIRA_STORIES_COLLECTION)
-            if stats.get('count', 0) == 0:
-                logger.info("Jira stories collection is empty, skipping retrieval")
-                return []
-            
-            results = await self.store.retrieve_similar(
-                collection_name=self.store.JIRA_STORIES_COLLECTION,
-                query_text=query,
-                top_k=self.top_k_stories,
-                metadata_filter=metadata_filter
-            )
-            logger.info(f"Retrieved {len(results)} similar Jira stories")
-            return results
-        except Exception as e:
-            logger.warning(f"No similar Jira stories found: {e}")
-            return []
-    
-    async def _retrieve_similar_existing_tests(
-        self,
-        query: str,
-        metadata_filter: Dict[str, Any]
-    ) -> List[Dict[str, Any]]:
-        """Retrieve similar existing test cases."""
-        try:
-            # Check if collection has documents
-            stats = self.store.get_collection_stats(self.store.EXISTING_TESTS_COLLECTION)
-            if stats.get('count', 0) == 0:
-                logger.info("Existing tests collection is empty, skipping retrieval")
-                return []
-            
-            results = await self.store.retrieve_similar(
-                collection_name=self.store.EXISTING_TESTS_COLLECTION,
-                query_text=query,
-                top_k=self.top_k_existing,
-                metadata_filter=metadata_filter
-            )
-            logger.info(f"Retrieved {len(results)} similar existing tests")
-            return results
-        except Exception as e:
-            logger.warning(f"No similar existing tests found: {e}")
-            return []
 
+
+_retriever: Optional[RAGRetriever] = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> RAGRetriever:
+    """
+    Get the process-wide RAGRetriever, creating it on first use.
+    
+    Sharing one keeps its collection handles and query embedding cache warm
+    across stories instead of rebuilding them for every generation.
+    """
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = RAGRetriever()
+    return _retriever
@@ -4,14 +4,18 @@ RAG Vector Store using ChromaDB for semantic search and retrieval.
 
 from typing import List, Dict, Optional, Any
 from pathlib import Path
-import json
+import asyncio
+import hashlib
 
 import chromadb
+import numpy as np
+from cachetools import TTLCache
 from chromadb.config import Settings as ChromaSettings
 from loguru import logger
 
 from src.config.settings import settings
-from src.ai.embedding_service import EmbeddingService
+from src.ai.embedding_service import get_embedding_service
+from src.utils.cache import AsyncTTLCache
 
 
 class RAGVectorStore:
@@ -26,6 +30,11 @@ class RAGVectorStore:
     JIRA_STORIES_COLLECTION = "jira_stories"
     EXISTING_TESTS_COLLECTION = "existing_tests"
     
+    # HNSW graph parameters for new collections (Chroma defaults: M=16,
+    # construction_ef=100, search_ef=10)
+    HNSW_M = 16
+    HNSW_CONSTRUCTION_EF = 200
+    
     def __init__(self, collection_path: Optional[str] = None):
         """
         Initialize RAG vector store.
@@ -36,17 +45,36 @@ class RAGVectorStore:
         self.collection_path = Path(collection_path or settings.rag_collection_path)
         self.collection_path.mkdir(parents=True, exist_ok=True)
         
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=str(self.collection_path),
-            settings=ChromaSettings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
+        # Query embeddings by text hash; concurrent lookups of the same query
+        # (one per collection) share a single embedding call
+        self._query_embedding_cache = AsyncTTLCache(maxsize=1024, ttl=3600)
         
-        # Initialize embedding service
-        self.embedding_service = EmbeddingService()
+        # Collection document counts, refreshed every 30s and dropped on writes
+        self._count_cache: TTLCache = TTLCache(maxsize=16, ttl=30)
+        
+        # Collection handles by name (the set of collections is fixed)
+        self._collections: Dict[str, Any] = {}
+        
+        # Initialize ChromaDB client and embedding service; a misconfigured
+        # store stays usable but disabled so callers can skip RAG work cheaply
+        self.disabled_reason: Optional[str] = None
+        try:
+            self.client = chromadb.PersistentClient(
+                path=str(self.collection_path),
+                settings=ChromaSettings(
+                    anonymized_telemetry=False,
+                    allow_reset=True
+                )
+            )
+            self.embedding_service = get_embedding_service()
+            self.enabled = True
+        except Exception as e:
+            logger.warning(f"RAG vector store disabled: {e}")
+            self.disabled_reason = str(e)
+            self.client = None
+            self.embedding_service = None
+            self.enabled = False
+            return
         
         logger.info(f"Initialized RAG vector store at {self.collection_path}")
     
@@ -60,22 +88,52 @@ class RAGVectorStore:
         Returns:
             ChromaDB collection object
         """
+        if not self.enabled:
+            raise RuntimeError("RAG vector store is disabled")
+        
+        collection = self._collections.get(collection_name)
+        if collection is not None:
+            return collection
+        
         try:
             collection = self.client.get_or_create_collection(
                 name=collection_name,
-                metadata={"hnsw:space": "cosine"}  # Use cosine similarity
+                metadata=self._collection_metadata(collection_name)
             )
+            self._collections[collection_name] = collection
             return collection
         except Exception as e:
             logger.error(f"Failed to get/create collection {collection_name}: {e}")
             raise
     
+    def _collection_metadata(self, collection_name: str) -> Dict[str, Any]:
+        """
+        Index settings for a collection.
+        
+        search_ef is sized to the collection's configured top_k: Chroma's
+        default of 10 is below several rag_top_k_* values, which costs recall.
+        """
+        top_k = {
+            self.TEST_PLANS_COLLECTION: settings.rag_top_k_tests,
+            self.CONFLUENCE_DOCS_COLLECTION: settings.rag_top_k_docs,
+            self.JIRA_STORIES_COLLECTION: settings.rag_top_k_stories,
+            self.EXISTING_TESTS_COLLECTION: settings.rag_top_k_existing,
+        }.get(collection_name, 10)
+        
+        return {
+            "hnsw:space": "cosine",  # Use cosine similarity
+            "hnsw:M": self.HNSW_M,
+            "hnsw:construction_ef": self.HNSW_CONSTRUCTION_EF,
+            "hnsw:search_ef": max(64, 4 * top_k),
+        }
+    
     async def add_documents(
         self,
         collection_name: str,
         documents: List[str],
         metadatas: List[Dict[str, Any]],
-        ids: List[str]
+        ids: List[str],
+        embeddings: Optional[np.ndarray] = None
     ) -> None:
         """
         Add documents to a collection with embeddings.
@@ -85,26 +143,33 @@ class RAGVectorStore:
             documents: List of document texts
             metadatas: List of metadata dicts for each document
             ids: List of unique IDs for each document
+            embeddings: Precomputed float32 embeddings (generated if omitted)
         """
         if not documents:
             logger.warning("No documents to add")
             return
         
+        if not self.enabled:
+            logger.debug(f"RAG vector store disabled, skipping add to {collection_name}")
+            return
+        
         if len(documents) != len(metadatas) != len(ids):
             raise ValueError("documents, metadatas, and ids must have the same length")
         
         logger.info(f"Adding {len(documents)} documents to {collection_name}")
         
         # Generate embeddings
-        embeddings = await self.embedding_service.embed_texts(documents)
+        if embeddings is None:
+            embeddings = await self.embedding_service.embed_texts(documents)
         
         # Get collection
-        collection = self.get_or_create_collection(collection_name)
+        collection = await asyncio.to_thread(self.get_or_create_collection, collection_name)
         
-        # Add to ChromaDB
+        # Add to ChromaDB (blocking client, so off the event loop)
         try:
-            collection.add(
-                embeddings=embeddings,
+            await asyncio.to_thread(
+                collection.add,
+                embeddings=embeddings.tolist(),  # Chroma validates plain lists
                 documents=documents,
                 metadatas=metadatas,
                 ids=ids
@@ -113,6 +178,8 @@ class RAGVectorStore:
         except Exception as e:
             logger.error(f"Failed to add documents to {collection_name}: {e}")
             raise
+        finally:
+            self._count_cache.pop(collection_name, None)
     
     async def retrieve_similar(
         self,
@@ -133,22 +200,52 @@ class RAGVectorStore:
         Returns:
             List of retrieved documents with metadata and similarity scores
         """
-        logger.info(f"Retrieving top {top_k} similar documents from {collection_name}")
+        if not self.enabled:
+            return []
         
         # Generate query embedding
-        query_embedding = await self.embedding_service.embed_single(query_text)
+        query_embedding = await self.embed_query(query_text)
+        
+        return await self.retrieve_similar_by_vector(
+            collection_name, query_embedding, top_k=top_k, metadata_filter=metadata_filter
+        )
+    
+    async def retrieve_similar_by_vector(
+        self,
+        collection_name: str,
+        query_embedding: np.ndarray,
+        top_k: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieve similar documents for an already embedded query.
+        
+        Args:
+            collection_name: Name of the collection to search
+            query_embedding: Query vector (e.g. from embed_query)
+            top_k: Number of results to return
+            metadata_filter: Optional metadata filters (e.g., {"project_key": "PLAT"})
+            
+        Returns:
+            List of retrieved documents with metadata and similarity scores
+        """
+        if not self.enabled:
+            return []
+        
+        logger.info(f"Retrieving top {top_k} similar documents from {collection_name}")
         
         # Get collection
         try:
-            collection = self.get_or_create_collection(collection_name)
+            collection = await asyncio.to_thread(self.get_or_create_collection, collection_name)
         except Exception as e:
             logger.error(f"Collection {collection_name} not found: {e}")
             return []
         
-        # Query ChromaDB
+        # Query ChromaDB off the event loop so concurrent searches overlap
         try:
-            results = collection.query(
-                query_embeddings=[query_embedding],
+            results = await asyncio.to_thread(
+                collection.query,
+                query_embeddings=[query_embedding.tolist()],
                 n_results=top_k,
                 where=metadata_filter
             )
@@ -171,6 +268,23 @@ class RAGVectorStore:
             logger.error(f"Failed to query {collection_name}: {e}")
             return []
     
+    async def embed_query(self, query_text: str) -> np.ndarray:
+        """
+        Embed a query, reusing the vector for repeated or concurrent queries.
+        
+        Raises:
+            RuntimeError: If embedding failed (the service returns a zero
+                vector, which has no cosine distance and must not be cached)
+        """
+        async def fetch() -> np.ndarray:
+            embedding = await self.embedding_service.embed_single(query_text)
+            if not embedding.any():
+                raise RuntimeError("Failed to embed query")
+            return embedding
+        
+        key = hashlib.sha256(query_text.encode("utf-8")).digest()
+        return await self._query_embedding_cache.get_or_fetch(key, fetch)
+    
     def get_collection_stats(self, collection_name: str) -> Dict[str, Any]:
         """
         Get statistics for a collection.
@@ -182,8 +296,11 @@ class RAGVectorStore:
             Dictionary with collection statistics
         """
         try:
-            collection = self.get_or_create_collection(collection_name)
-            count = collection.count()
+            count = self._count_cache.get(collection_name)
+            if count is None:
+                collection = self.get_or_create_collection(collection_name)
+                count = collection.count()
+                self._count_cache[collection_name] = count
             
             return {
                 "name": collection_name,
@@ -233,6 +350,8 @@ class RAGVectorStore:
         Args:
             collection_name: Name of the collection to clear
         """
+        self._count_cache.pop(collection_name, None)
+        self._collections.pop(collection_name, None)
         try:
             self.client.delete_collection(collection_name)
             logger.info(f"Cleared collection: {collection_name}")
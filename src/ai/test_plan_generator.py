@@ -2,24 +2,49 @@
 AI test plan generator - the core intelligence of the system.
 """
 
+import asyncio
 import json
+import weakref
 from typing import Optional, List, Dict
 
 from loguru import logger
 
 from src.aggregator.story_collector import StoryContext
+from src.ai.generation.ai_client_factory import AIClientFactory
+from src.ai.generation.prompt_builder import PromptBuilder
+from src.ai.prompt_cache import PromptCache, get_prompt_cache
 from src.config.settings import settings
 from src.models.test_plan import TestPlan, TestPlanMetadata
 
 from .prompts_qa_focused import (
     EXPERT_QA_SYSTEM_PROMPT,
     FEW_SHOT_EXAMPLES,
-    USER_FLOW_GENERATION_PROMPT,
-    BUSINESS_CONTEXT_PROMPT,
-    MANAGEMENT_API_CONTEXT,
     RAG_GROUNDING_PROMPT,
 )
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Caps concurrent LLM calls across all generators, so a burst of requests
+# queues here instead of tripping provider rate limits. One per event loop:
+# a semaphore binds to the loop it first waits on, and the CLI and tests
+# run several loops in one process
+_llm_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    """LLM call semaphore for the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _llm_semaphores[loop] = asyncio.Semaphore(settings.max_concurrent_llm_requests)
+    return semaphore
+
 
 class TestPlanGenerator:
     """
@@ -41,15 +66,37 @@ class TestPlanGenerator:
         self.max_tokens = settings.max_tokens
         
         if use_openai:
-            from openai import OpenAI
             self.api_key = api_key or settings.openai_api_key
             self.model = model or "gpt-4o"  # GPT-4o - best for structured JSON output
-            self.client = OpenAI(api_key=self.api_key)
         else:
-            from anthropic import Anthropic
             self.api_key = api_key or settings.anthropic_api_key
             self.model = model or settings.default_ai_model
-            self.client = Anthropic(api_key=self.api_key)
+        self._client = None
+        
+        # Optional cache of raw responses for byte-identical requests
+        self.response_cache: Optional[PromptCache] = None
+        if settings.llm_response_cache_path:
+            try:
+                self.response_cache = get_prompt_cache(settings.llm_response_cache_path)
+            except Exception as e:
+                logger.warning(f"LLM response cache disabled, could not open {settings.llm_response_cache_path}: {e}")
+
+    @property
+    def client(self):
+        """
+        Async AI client, so a multi-second generation doesn't block the event loop.
+        
+        Shared per provider and key on the running loop, so every generator (one
+        per API request) reuses the same pooled connections instead of new TLS
+        handshakes.
+        """
+        if self._client is not None:
+            return self._client
+        return AIClientFactory.create_async_client(self.use_openai, self.api_key)
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
 
     async def generate_test_plan(
         self, 
@@ -84,11 +131,11 @@ class TestPlanGenerator:
         rag_context_section = ""
         if use_rag:
             try:
-                from src.ai.rag_retriever import RAGRetriever
+                from src.ai.rag_retriever import get_retriever
                 
                 logger.info("Retrieving RAG context...")
-                rag_retriever = RAGRetriever()
-                project_key = main_story.key.split('-')[0]
+                rag_retriever = get_retriever()
+                project_key = main_story.key.partition('-')[0]
                 retrieved_context = await rag_retriever.retrieve_for_story(
                     story=main_story,
                     project_key=project_key
@@ -116,119 +163,123 @@ class TestPlanGenerator:
         elif existing_tests:
             # Fallback to keyword-based matching if RAG is disabled
             logger.info(f"RAG disabled, using keyword matching on {len(existing_tests)} tests")
-            existing_tests_context = "\n=== EXISTING TEST CASES IN ZEPHYR (Check for Duplicates!) ===\n"
-            existing_tests_context += "(IMPORTANT: DO NOT create tests that already exist. If a test already covers the flow, mention it in 'related_existing_tests'.)\n\n"
+            existing_tests_parts = [
+                "\n=== EXISTING TEST CASES IN ZEPHYR (Check for Duplicates!) ===\n",
+                "(IMPORTANT: DO NOT create tests that already exist. If a test already covers the flow, mention it in 'related_existing_tests'.)\n\n",
+            ]
             
-            # Show relevant tests (search for keywords from story)
-            story_keywords = main_story.summary.lower().split()
+            # Show relevant tests (search for keywords from story, ignoring short words)
+            story_keywords = [keyword for keyword in main_story.summary.lower().split() if len(keyword) > 3]
             relevant_tests = []
             
             for test in existing_tests[:500]:  # Check first 500 most recent
-                test_name = test.get('name', '').lower()
-                test_obj = (test.get('objective') or '').lower()  # Handle None
+                # One lowercased text per test; keywords have no whitespace, so
+                # none can match across the newline between name and objective
+                test_text = f"{test.get('name') or ''}\n{test.get('objective') or ''}".lower()
                 
                 # Check if test is relevant to this story
-                if any(keyword in test_name or keyword in test_obj for keyword in story_keywords if len(keyword) > 3):
+                if any(keyword in test_text for keyword in story_keywords):
                     relevant_tests.append(test)
                     if len(relevant_tests) >= 50:  # Show top 50 relevant
                         break
             
             if relevant_tests:
-                existing_tests_context += f"Found {len(relevant_tests)} potentially relevant existing tests:\n\n"
+                existing_tests_parts.append(f"Found {len(relevant_tests)} potentially relevant existing tests:\n\n")
                 for test in relevant_tests[:20]:  # Show top 20
-                    existing_tests_context += f"- {test.get('key', 'N/A')}: {test.get('name', 'N/A')}\n"
+                    existing_tests_parts.append(f"- {test.get('key', 'N/A')}: {test.get('name', 'N/A')}\n")
                     if test.get('objective'):
-                        existing_tests_context += f"  Description: {test['objective'][:150]}...\n"
+                        existing_tests_parts.append(f"  Description: {test['objective'][:150]}...\n")
             else:
-                existing_tests_context += f"Searched {len(existing_tests)} tests, none seem directly related.\n"
+                existing_tests_parts.append(f"Searched {len(existing_tests)} tests, none seem directly related.\n")
+            existing_tests_context = "".join(existing_tests_parts)
         
         # Add engineering tasks context
         tasks_context = ""
         subtasks = context.get("subtasks", [])
         if subtasks:
-            tasks_context = "\n=== ENGINEERING TASKS FOR THIS STORY ===\n"
-            tasks_context += "(Use these to identify regression test scenarios)\n\n"
+            tasks_parts = [
+                "\n=== ENGINEERING TASKS FOR THIS STORY ===\n",
+                "(Use these to identify regression test scenarios)\n\n",
+            ]
             for task in subtasks:
-                tasks_context += f"- {task.key}: {task.summary}\n"
+                tasks_parts.append(f"- {task.key}: {task.summary}\n")
                 if task.description:
-                    desc = task.description[:200] if len(task.description) > 200 else task.description
-                    tasks_context += f"  Details: {desc}\n"
+                    tasks_parts.append(f"  Details: {task.description[:200]}\n")
+            tasks_context = "".join(tasks_parts)
         
         # Add folder structure context for smart placement
         folder_context = ""
         if folder_structure:
-            folder_context = "\n=== ZEPHYR TEST FOLDER STRUCTURE ===\n"
-            folder_context += "(Suggest the most appropriate folder based on the feature area)\n\n"
+            folder_parts = [
+                "\n=== ZEPHYR TEST FOLDER STRUCTURE ===\n",
+                "(Suggest the most appropriate folder based on the feature area)\n\n",
+            ]
             for folder in folder_structure[:15]:  # Show top folders
                 folder_name = folder.get('name', 'Unknown')
                 folder_id = folder.get('id', 'N/A')
-                folder_context += f"- {folder_name} (ID: {folder_id})\n"
+                folder_parts.append(f"- {folder_name} (ID: {folder_id})\n")
                 # Show subfolders if they exist
                 if folder.get('folders'):
                     for subfolder in folder['folders'][:5]:
                         subfolder_name = subfolder.get('name', 'Unknown')
-                        folder_context += f"  └── {subfolder_name}\n"
+                        folder_parts.append(f"  └── {subfolder_name}\n")
+            folder_context = "".join(folder_parts)
         
         # Build Figma context (if available)
         figma_context = ""
         # TODO: Integrate Figma client to extract UI elements
         # For now, placeholder
         
-        # Build the final prompt with RAG grounding if available
+        # Build the final prompt: few-shot examples for better quality, then
+        # RAG grounding (if available) at the top of the request for emphasis
+        prompt_parts = [FEW_SHOT_EXAMPLES, "\n\n"]
         if use_rag and rag_context_section:
-            # Add RAG grounding at the top for emphasis
-            prompt = RAG_GROUNDING_PROMPT + "\n\n" + rag_context_section + "\n\n"
-        else:
-            prompt = ""
+            prompt_parts += [RAG_GROUNDING_PROMPT, "\n\n", rag_context_section, "\n\n"]
         
-        prompt += USER_FLOW_GENERATION_PROMPT.format(
-            business_context=BUSINESS_CONTEXT_PROMPT,
-            management_api_context=MANAGEMENT_API_CONTEXT,
+        prompt_parts.append(PromptBuilder.build_prompt(
             context=full_context,
             existing_tests_context=existing_tests_context,
             tasks_context=tasks_context,
             folder_context=folder_context,
             figma_context=figma_context or "(No Figma designs available)"
-        )
-
-        # Add few-shot examples for better quality
-        prompt = FEW_SHOT_EXAMPLES + "\n\n" + prompt
+        ))
+        prompt = "".join(prompt_parts)
+
+        cache_key = None
+        response_text = None
+        if self.response_cache:
+            cache_key = PromptCache.key(
+                self.model, self.temperature, self.max_tokens, EXPERT_QA_SYSTEM_PROMPT, prompt
+            )
+            # sqlite I/O stays off the event loop
+            response_text = await asyncio.to_thread(self.response_cache.get, cache_key)
+            if response_text is not None:
+                logger.info(f"Using cached AI response for {main_story.key}")
 
+        fetched = False
         try:
-            # Call AI API
-            if self.use_openai:
-                logger.info(f"Calling OpenAI API with model: {self.model}")
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    messages=[
-                        {"role": "system", "content": EXPERT_QA_SYSTEM_PROMPT},
-                        {"role": "user", "content": prompt}
-                    ],
-                )
-                response_text = response.choices[0].message.content
-            else:
-                logger.info(f"Calling Claude API with model: {self.model}")
-                response = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    system=EXPERT_QA_SYSTEM_PROMPT,
-                    messages=[{"role": "user", "content": prompt}],
-                )
-                response_text = response.content[0].text
+            if response_text is None:
+                response_text = await self._call_ai(prompt)
+                fetched = True
             
             logger.debug(f"AI Response received: {len(response_text)} characters")
 
             # Parse JSON response
             test_plan_data = self._parse_ai_response(response_text)
+            
+            # Only cache fresh responses that parsed, so a bad one is regenerated next time
+            if cache_key is not None and fetched:
+                try:
+                    await asyncio.to_thread(self.response_cache.put, cache_key, response_text)
+                except Exception as e:
+                    logger.warning(f"Failed to write LLM response cache: {e}")
 
             # Build TestPlan object
             test_plan = self._build_test_plan(
                 main_story=main_story,
                 test_plan_data=test_plan_data,
                 ai_model=self.model,
+                folder_structure=folder_structure,
             )
 
             logger.info(
@@ -238,12 +289,11 @@ class TestPlanGenerator:
             # Auto-index test plan for future RAG retrieval if enabled
             if use_rag and settings.rag_auto_index:
                 try:
-                    from src.ai.context_indexer import ContextIndexer
+                    from src.ai.context_indexer import get_indexer
                     
                     logger.info("Auto-indexing test plan for future RAG retrieval...")
-                    indexer = ContextIndexer()
+                    indexer = get_indexer()
                     # Run indexing in background (don't block test generation)
-                    import asyncio
                     asyncio.create_task(indexer.index_test_plan(test_plan, context))
                 except Exception as e:
                     logger.warning(f"Auto-indexing failed (non-critical): {e}")
@@ -254,6 +304,42 @@ class TestPlanGenerator:
             logger.error(f"Failed to generate test plan: {e}")
             raise
 
+    async def _call_ai(self, prompt: str) -> str:
+        """
+        Send the generation prompt to the configured AI provider.
+        
+        At most settings.max_concurrent_llm_requests calls run at once.
+
+        Args:
+            prompt: Fully rendered user prompt
+
+        Returns:
+            Raw response text
+        """
+        async with _llm_semaphore():
+            if self.use_openai:
+                logger.info(f"Calling OpenAI API with model: {self.model}")
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    messages=[
+                        {"role": "system", "content": EXPERT_QA_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                )
+                return response.choices[0].message.content
+            
+            logger.info(f"Calling Claude API with model: {self.model}")
+            response = await self.client.messages.create(
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                system=EXPERT_QA_SYSTEM_PROMPT,
+                messages=[{"role": "user", "content": prompt}],
+            )
+            return response.content[0].text
+
     def _parse_ai_response(self, response_text: str) -> dict:
         """
         Parse AI response text into structured data.
@@ -276,6 +362,15 @@ class TestPlanGenerator:
 
         json_text = response_text[json_start:json_end]
 
+        # orjson is several times faster on multi-KB responses; anything it
+        # rejects (e.g. NaN) goes through the stdlib parser, which also
+        # produces the error message
+        if ORJSON_AVAILABLE:
+            try:
+                return orjson.loads(json_text)
+            except orjson.JSONDecodeError:
+                pass
+
         try:
             data = json.loads(json_text)
             return data
@@ -285,7 +380,11 @@ class TestPlanGenerator:
             raise ValueError(f"Invalid JSON in AI response: {e}")
 
     def _build_test_plan(
-        self, main_story: any, test_plan_data: dict, ai_model: str
+        self,
+        main_story: any,
+        test_plan_data: dict,
+        ai_model: str,
+        folder_structure: Optional[List[Dict]] = None,
     ) -> TestPlan:
         """
         Build TestPlan object from parsed AI data.
@@ -294,6 +393,7 @@ class TestPlanGenerator:
             main_story: The main Jira story
             test_plan_data: Parsed test plan data from AI
             ai_model: AI model used
+            folder_structure: Zephyr folder structure (for the folder fallback)
 
         Returns:
             TestPlan object
@@ -428,7 +528,7 @@ class TestPlanGenerator:
         return "\n".join(sections)
     
     def _extract_folder_from_story(
-        self, main_story: any, folder_structure: List[Dict]
+        self, main_story: any, folder_structure: Optional[List[Dict]]
     ) -> str:
         """
         Dynamically extract folder from story by analyzing:
@@ -438,7 +538,7 @@ class TestPlanGenerator:
         
         Args:
             main_story: The main Jira story
-            folder_structure: List of folders from Zephyr
+            folder_structure: List of folders from Zephyr (may be None)
             
         Returns:
             Suggested folder path
@@ -449,7 +549,7 @@ class TestPlanGenerator:
         
         # Extract all folder names from structure
         folder_names = []
-        for folder in folder_structure:
+        for folder in folder_structure or []:
             folder_names.append(folder.get('name', ''))
             if folder.get('folders'):
                 for subfolder in folder['folders']:
@@ -464,14 +564,13 @@ class TestPlanGenerator:
             folder_lower = folder_name.lower()
             score = 0
             
-            # Check for keyword matches
+            # Check for keyword matches. Keywords contain no whitespace, so one
+            # found inside a story word is also found in the combined text:
+            # a substring check of the whole text covers partial matches too
             folder_keywords = folder_lower.replace('/', ' ').split()
             for keyword in folder_keywords:
-                if len(keyword) > 3:  # Ignore short words
-                    if keyword in combined_text:
-                        score += 2  # Strong match
-                    elif any(keyword in word for word in combined_text.split()):
-                        score += 1  # Partial match
+                if len(keyword) > 3 and keyword in combined_text:  # Ignore short words
+                    score += 2
             
             if score > 0:
                 folder_scores[folder_name] = score
@@ -19,6 +19,12 @@ from .routes import stories, test_plans, ui, rag
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     logger.info(f"Starting Womba API Server - Environment: {settings.environment}")
+    if settings.enable_rag:
+        try:
+            from src.ai.rag_retriever import get_retriever
+            await get_retriever().warmup()
+        except Exception as e:
+            logger.warning(f"RAG warmup failed (non-critical): {e}")
     yield
     logger.info("Shutting down Womba API Server")
 
@@ -8,7 +8,7 @@ from pydantic import BaseModel
 from loguru import logger
 
 from src.ai.rag_store import RAGVectorStore
-from src.ai.context_indexer import ContextIndexer
+from src.ai.context_indexer import get_indexer
 from src.aggregator.story_collector import StoryCollector
 from src.integrations.zephyr_integration import ZephyrIntegration
 
@@ -30,6 +30,22 @@ class SearchRequest(BaseModel):
     project_key: Optional[str] = None
 
 
+def _get_enabled_indexer():
+    """
+    Get the shared indexer, failing with 503 if its vector store is disabled.
+    
+    Indexing into a disabled store is a silent no-op, so report it rather
+    than claiming success.
+    """
+    indexer = get_indexer()
+    if not indexer.store.enabled:
+        raise HTTPException(
+            status_code=503,
+            detail=f"RAG vector store is disabled: {indexer.store.disabled_reason}"
+        )
+    return indexer
+
+
 @router.get("/stats")
 async def get_rag_stats():
     """
@@ -58,6 +74,8 @@ async def index_story(request: IndexRequest):
     Returns:
         Success message with indexing results
     """
+    indexer = _get_enabled_indexer()
+    
     try:
         logger.info(f"API: Indexing story {request.story_key}")
         
@@ -66,8 +84,7 @@ async def index_story(request: IndexRequest):
         context = await collector.collect_story_context(request.story_key)
         
         # Index the context
-        indexer = ContextIndexer()
-        project_key = request.project_key or request.story_key.split('-')[0]
+        project_key = request.project_key or request.story_key.partition('-')[0]
         await indexer.index_story_context(context, project_key)
         
         return {
@@ -94,6 +111,8 @@ async def index_all_tests(project_key: str, max_tests: int = 1000):
     Returns:
         Success message with indexing results
     """
+    indexer = _get_enabled_indexer()
+    
     try:
         logger.info(f"API: Batch indexing tests for project {project_key}")
         
@@ -102,7 +121,6 @@ async def index_all_tests(project_key: str, max_tests: int = 1000):
         tests = await zephyr.get_test_cases_for_project(project_key, max_results=max_tests)
         
         # Index tests
-        indexer = ContextIndexer()
         await indexer.index_existing_tests(tests, project_key)
         
         return {
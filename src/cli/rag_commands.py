@@ -7,7 +7,7 @@ import asyncio
 from typing import Optional
 from loguru import logger
 
-from src.ai.context_indexer import ContextIndexer
+from src.ai.context_indexer import ContextIndexer, get_indexer
 from src.ai.rag_store import RAGVectorStore
 from src.integrations.zephyr_integration import ZephyrIntegration
 from src.aggregator.jira_client import JiraClient
@@ -16,6 +16,20 @@ from src.aggregator.story_collector import StoryCollector
 from src.models.story import JiraStory
 
 
+def _get_enabled_indexer() -> ContextIndexer:
+    """
+    Get the shared indexer, raising if its vector store is disabled.
+    
+    Raises:
+        ValueError: If the store couldn't start (e.g. missing OpenAI key), so
+            the CLI reports a configuration error instead of a no-op "success"
+    """
+    indexer = get_indexer()
+    if not indexer.store.enabled:
+        raise ValueError(f"RAG vector store is disabled: {indexer.store.disabled_reason}")
+    return indexer
+
+
 async def fetch_and_index_zephyr_tests(
     project_key: str,
     indexer: ContextIndexer
@@ -56,27 +70,9 @@ async def fetch_and_index_jira_stories(
     
     try:
         jira_client = JiraClient()
-        all_stories = []
-        start_at = 0
-        max_results = 100
-        
-        while True:
-            jql = f"project = {project_key} AND type in (Story, Task, Bug) ORDER BY created DESC"
-            result = await jira_client.search_issues(jql, max_results=max_results, start_at=start_at)
-            
-            # Result is now a List[JiraStory] from the async method
-            if not result:
-                break
-            
-            # Add stories to list
-            all_stories.extend(result)
-            
-            # Check if there are more results
-            if len(result) < max_results:
-                break
-            
-            start_at += max_results
-            print(f"  Fetched {len(all_stories)} stories so far...")
+        jql = f"project = {project_key} AND type in (Story, Task, Bug) ORDER BY created DESC"
+        # Pages are followed one at a time by nextPageToken until the last one
+        all_stories = await jira_client.search_all_issues(jql, page_size=100)
         
         print(f"Found {len(all_stories)} Jira stories")
         
@@ -204,7 +200,7 @@ async def index_all_data(project_key: str) -> dict:
     print("  3. All Confluence docs from project space")
     print("\n⏳ This may take 5-15 minutes for large projects...\n")
     
-    indexer = ContextIndexer()
+    indexer = _get_enabled_indexer()
     
     # Index all three types
     tests_count = await fetch_and_index_zephyr_tests(project_key, indexer)
@@ -228,13 +224,14 @@ async def index_story_context(story_key: str) -> None:
     """
     print(f"\n📊 Indexing context for story {story_key}...")
     
+    indexer = _get_enabled_indexer()
+    
     # Collect story context
     collector = StoryCollector()
     context = await collector.collect_story_context(story_key)
     
     # Index the context
-    indexer = ContextIndexer()
-    project_key = story_key.split('-')[0]
+    project_key = story_key.partition('-')[0]
     await indexer.index_story_context(context, project_key)
     
     print(f"✅ Successfully indexed {story_key}")
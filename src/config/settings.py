@@ -78,15 +78,25 @@ class Settings(BaseSettings):
     )
     temperature: float = Field(default=0.8, description="AI temperature for generation (higher = more creative)")
     max_tokens: int = Field(default=10000, description="Max tokens for AI responses")
+    max_concurrent_llm_requests: int = Field(default=8, description="Max test plan LLM calls in flight per process")
     
     # RAG Configuration
     enable_rag: bool = Field(default=True, description="Enable RAG for context retrieval")
     rag_collection_path: str = Field(default="./data/chroma", description="ChromaDB storage path")
     embedding_model: str = Field(default="text-embedding-3-small", description="OpenAI embedding model")
+    embedding_cache_path: str = Field(
+        default="./data/embedding_cache.sqlite3",
+        description="SQLite file caching embeddings by content hash (empty to disable)"
+    )
+    llm_response_cache_path: str = Field(
+        default="",
+        description="SQLite file caching test plan LLM responses by exact prompt hash (empty to disable)"
+    )
     rag_top_k_tests: int = Field(default=5, description="Number of similar test plans to retrieve")
     rag_top_k_docs: int = Field(default=10, description="Number of similar docs to retrieve")
     rag_top_k_stories: int = Field(default=10, description="Number of similar Jira stories to retrieve")
     rag_top_k_existing: int = Field(default=20, description="Number of similar existing tests to retrieve")
+    rag_min_query_chars: int = Field(default=20, description="Skip retrieval for story queries shorter than this")
     rag_auto_index: bool = Field(default=True, description="Automatically index after test generation")
 
 
@@ -0,0 +1,73 @@
+"""
+Async-aware TTL caching shared across the codebase.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from cachetools import TTLCache
+
+
+class AsyncTTLCache:
+    """
+    Size- and time-bounded cache for coroutine results.
+
+    Concurrent misses on the same key share one fetch: the first caller
+    fetches while the others wait on a per-key lock and then read the
+    cached value. Exceptions are not cached.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries (least recently used are evicted)
+            ttl: Seconds an entry stays valid
+        """
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key, calling fetch() on a miss.
+
+        Args:
+            key: Cache key
+            fetch: Zero-argument coroutine function producing the value
+
+        Returns:
+            Cached or freshly fetched value
+        """
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                try:
+                    return self._cache[key]
+                except KeyError:
+                    pass
+                value = await fetch()
+                self._cache[key] = value
+                return value
+        finally:
+            if not lock.locked():
+                self._locks.pop(key, None)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value fetched outside get_or_fetch (e.g. by a bulk request)."""
+        self._cache[key] = value
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        self._cache.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._cache
+
+    def __len__(self) -> int:
+        return len(self._cache)
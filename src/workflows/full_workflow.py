@@ -119,7 +119,7 @@ class FullWorkflowOrchestrator:
         zephyr = ZephyrIntegration()
         
         # Extract project key from story key (e.g., PLAT-12991 -> PLAT)
-        project_key = self.story_key.split('-')[0]
+        project_key = self.story_key.partition('-')[0]
         
         results = await zephyr.upload_test_plan(
             test_plan=self.test_plan,
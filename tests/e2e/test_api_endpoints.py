@@ -71,3 +71,21 @@ class TestAPIEndpoints:
         # Should fail because project_key is required when upload_to_zephyr is True
         assert response.status_code == 400
 
+
+    @pytest.mark.e2e
+    @pytest.mark.asyncio
+    async def test_rag_index_rejected_when_store_disabled(self, api_client, mocker):
+        """Test indexing reports 503 instead of success when the RAG store is disabled."""
+        indexer = mocker.MagicMock()
+        indexer.store.enabled = False
+        indexer.store.disabled_reason = "OpenAI API key not configured"
+        mocker.patch("src.api.routes.rag.get_indexer", return_value=indexer)
+
+        response = await api_client.post("/api/v1/rag/index", json={"story_key": "PROJ-1"})
+        assert response.status_code == 503
+        assert "disabled" in response.json()["detail"]
+
+        response = await api_client.post("/api/v1/rag/index/batch", params={"project_key": "PROJ"})
+        assert response.status_code == 503
+        indexer.index_story_context.assert_not_called()
+        indexer.index_existing_tests.assert_not_called()
@@ -19,6 +19,7 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+import numpy as np
 from loguru import logger
 from src.ai.embedding_service import EmbeddingService
 from src.ai.rag_store import RAGVectorStore
@@ -62,7 +63,7 @@ async def test_embedding_service():
         embedding = await service.embed_single(text)
         
         assert len(embedding) == 1536, f"Expected 1536 dimensions, got {len(embedding)}"
-        assert all(isinstance(x, float) for x in embedding), "All embeddings should be floats"
+        assert embedding.dtype == np.float32, f"Expected float32 embeddings, got {embedding.dtype}"
         print_success(f"Generated embedding with {len(embedding)} dimensions")
         
         # Test batch embeddings
@@ -6,7 +6,7 @@ import pytest
 from httpx import AsyncClient, Response
 from pytest_mock import MockerFixture
 
-from src.aggregator.jira_client import JiraClient
+from src.aggregator.jira_client import JiraClient, _orjson_response_hook
 
 
 class TestJiraClient:
@@ -140,3 +140,83 @@ class TestJiraClient:
         assert len(linked_stories) == 1
         assert linked_stories[0].key == "PROJ-124"
 
+    @pytest.mark.asyncio
+    async def test_search_all_issues_follows_page_tokens(self, mocker: MockerFixture):
+        """Test that search_all_issues pages with nextPageToken until the last page."""
+        jira = mocker.MagicMock()
+        jira.enhanced_search_issues.side_effect = [
+            {"issues": [1], "nextPageToken": "a"},
+            {"issues": [2], "nextPageToken": "b"},
+            {"issues": [3], "isLast": True},
+        ]
+        mocker.patch.object(JiraClient, "_get_jira_sdk_client", return_value=jira)
+        mocker.patch.object(
+            JiraClient, "_parse_search_page", side_effect=lambda jira, data: data["issues"]
+        )
+
+        client = JiraClient()
+        results = await client.search_all_issues("project = PROJ", page_size=100)
+
+        assert results == [1, 2, 3]
+        tokens = [c.kwargs["nextPageToken"] for c in jira.enhanced_search_issues.call_args_list]
+        assert tokens == [None, "a", "b"]
+        assert all(c.kwargs["json_result"] for c in jira.enhanced_search_issues.call_args_list)
+
+    def test_orjson_response_hook_decodes_body(self, mocker: MockerFixture):
+        """Test that the session hook decodes response bodies with orjson."""
+        response = mocker.MagicMock(content=b'{"issues": [{"key": "PROJ-1"}]}')
+
+        _orjson_response_hook(response)
+
+        assert response.json() == {"issues": [{"key": "PROJ-1"}]}
+
+    def test_parse_issue_with_null_fields(self, sample_jira_issue_data):
+        """Test parsing issue where Jira returns explicit nulls."""
+        fields = sample_jira_issue_data["fields"]
+        fields.update(priority=None, reporter=None, components=None, attachment=None)
+
+        client = JiraClient()
+        story = client._parse_issue(sample_jira_issue_data)
+
+        assert story.priority == "Medium"
+        assert story.reporter == "unknown@example.com"
+        assert story.components == []
+        assert story.attachments == []
+
+    def test_extract_text_from_adf_includes_link_urls(self):
+        """Test that link marks and inlineCards keep their URLs in the text."""
+        page_url = "https://test.atlassian.net/wiki/spaces/ENG/pages/12345"
+        adf = {
+            "type": "doc",
+            "content": [
+                {
+                    "type": "paragraph",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "Design doc",
+                            "marks": [{"type": "link", "attrs": {"href": "https://example.com/d"}}],
+                        },
+                        {"type": "inlineCard", "attrs": {"url": page_url}},
+                    ],
+                }
+            ],
+        }
+
+        text = JiraClient()._extract_text_from_adf(adf)
+
+        assert "Design doc [ https://example.com/d ]" in text
+        assert page_url in text.split()
+
+    @pytest.mark.asyncio
+    async def test_validate_connection_times_out(self, mocker: MockerFixture):
+        """Test that a hung Jira is reported as unreachable instead of blocking."""
+        import time
+
+        sdk = mocker.MagicMock()
+        sdk.myself.side_effect = lambda: time.sleep(0.5)
+        mocker.patch.object(JiraClient, "_get_jira_sdk_client", return_value=sdk)
+
+        client = JiraClient()
+
+        assert await client.validate_connection(timeout=0.05) is False
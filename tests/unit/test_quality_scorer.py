@@ -0,0 +1,101 @@
+"""
+Unit tests for TestQualityScorer.
+"""
+
+from src.ai import quality_scorer
+from src.ai.quality_scorer import TestQualityScorer, _story_context_for
+
+
+class TestTestQualityScorer:
+    """Test suite for TestQualityScorer."""
+
+    def test_score_test_case(self, sample_test_case, sample_jira_story):
+        """Test scoring a test case that mentions the feature and has test data."""
+        scorer = TestQualityScorer()
+
+        score = scorer.score_test_case(sample_test_case, sample_jira_story)
+
+        # one feature keyword (20) + 2 steps (10) + UI indicators (15) + test data (25)
+        assert score == 70.0
+
+    def test_score_test_plan_extracts_keywords_once(self, mocker, sample_test_case, sample_jira_story):
+        """Test that story keywords are extracted once per plan, not per test."""
+        spy = mocker.spy(TestQualityScorer, "_prepare_story_context")
+        scorer = TestQualityScorer()
+
+        result = scorer.score_test_plan([sample_test_case] * 5, sample_jira_story)
+
+        assert spy.call_count == 1
+        assert result["individual_scores"] == [70.0] * 5
+        assert result["passing_tests"] == 5
+
+    def test_filter_low_quality_tests(self, sample_test_case, sample_jira_story):
+        """Test that tests below the passing score are dropped."""
+        weak = sample_test_case.model_copy(
+            update={"title": "Something", "description": "Generic", "steps": []}
+        )
+        scorer = TestQualityScorer()
+
+        kept = scorer.filter_low_quality_tests([sample_test_case, weak], sample_jira_story)
+
+        assert kept == [sample_test_case]
+
+    def test_acceptance_stops_once_outcome_is_decided(self, mocker, sample_test_case, sample_jira_story):
+        """Test that the threshold check skips scorers that can't change the outcome."""
+        weak = sample_test_case.model_copy(
+            update={"title": "Something", "description": "Generic", "steps": []}
+        )
+        scorer = TestQualityScorer()
+        spy = mocker.spy(scorer, "_score_feature_specificity")
+
+        assert not scorer.is_test_acceptable(weak, sample_jira_story)
+        assert spy.call_count == 0
+
+        assert scorer.is_test_acceptable(sample_test_case, sample_jira_story)
+        assert spy.call_count == 1
+
+    def test_indicator_matching_without_automaton(self, mocker, sample_test_case):
+        """Test that the substring fallback scores indicators like the automaton."""
+        api_only = sample_test_case.model_copy(
+            update={"title": "POST /v1/login", "description": "Calls the endpoint", "steps": []}
+        )
+        none = api_only.model_copy(update={"title": "Login", "description": "Works"})
+        scorer = TestQualityScorer()
+        cases = [sample_test_case, api_only, none]
+
+        with_automaton = [scorer._score_specific_indicators(tc) for tc in cases]
+        mocker.patch("src.ai.quality_scorer._INDICATOR_AUTOMATON", None)
+        fallback = [scorer._score_specific_indicators(tc) for tc in cases]
+
+        assert with_automaton == fallback == [15.0, 15.0, 0.0]
+
+    def test_scores_are_memoized_until_cleared(self, mocker, sample_test_case, sample_jira_story):
+        """Test that re-scoring an unchanged test hits the cache until clear_cache()."""
+        scorer = TestQualityScorer()
+        spy = mocker.spy(scorer, "_score_step_completeness")
+
+        scorer.score_test_plan([sample_test_case], sample_jira_story)
+        scorer.score_test_case(sample_test_case.model_copy(), sample_jira_story)
+        assert scorer.filter_low_quality_tests([sample_test_case], sample_jira_story) == [sample_test_case]
+        assert spy.call_count == 1
+
+        edited = sample_test_case.model_copy(update={"title": "Renamed"})
+        scorer.score_test_case(edited, sample_jira_story)
+        assert spy.call_count == 2
+
+        scorer.clear_cache()
+        scorer.score_test_case(sample_test_case, sample_jira_story)
+        assert spy.call_count == 3
+
+    def test_story_keywords_reused_across_calls(self, mocker, sample_test_case, sample_jira_story):
+        """Test that per-test calls for the same story tokenize its summary once."""
+        _story_context_for.cache_clear()
+        spy = mocker.spy(quality_scorer, "extract_keywords")
+        scorer = TestQualityScorer()
+        other = sample_test_case.model_copy(update={"title": "Other"})
+
+        scorer.is_test_acceptable(sample_test_case, sample_jira_story)
+        scorer.is_test_acceptable(other, sample_jira_story)
+
+        summary_calls = [c for c in spy.call_args_list if c.args[0] == sample_jira_story.summary]
+        assert len(summary_calls) == 1
@@ -2,6 +2,9 @@
 Unit tests for RAG vector store.
 """
 
+import asyncio
+
+import numpy as np
 import pytest
 from unittest.mock import Mock, patch, AsyncMock, MagicMock
 from src.ai.rag_store import RAGVectorStore
@@ -99,9 +102,9 @@ async def test_embedding_service_with_mock():
     mock_response = Mock()
     mock_response.data = [Mock(embedding=[0.1] * 1536)]
     
-    with patch('src.ai.embedding_service.OpenAI') as mock_openai:
+    with patch('src.ai.embedding_service.AsyncOpenAI') as mock_openai:
         mock_client = Mock()
-        mock_client.embeddings.create.return_value = mock_response
+        mock_client.embeddings.create = AsyncMock(return_value=mock_response)
         mock_openai.return_value = mock_client
         
         service = EmbeddingService(api_key="test_key")
@@ -111,9 +114,24 @@ async def test_embedding_service_with_mock():
         embedding = await service.embed_single(text)
         
         assert embedding is not None
-        assert len(embedding) == 1536
-        assert isinstance(embedding, list)
-        assert all(isinstance(x, float) for x in embedding)
+        assert embedding.shape == (1536,)
+        assert embedding.dtype == np.float32
+
+
+def test_embedding_service_client_per_event_loop():
+    """Test that each event loop gets its own OpenAI client."""
+    with patch('src.ai.embedding_service.AsyncOpenAI', side_effect=lambda **kw: Mock()) as mock_openai:
+        service = EmbeddingService(api_key="test_key", cache_path="")
+        
+        async def get_client():
+            return service.client, service.client
+        
+        first, again = asyncio.run(get_client())
+        second, _ = asyncio.run(get_client())
+        
+        assert first is again
+        assert first is not second
+        assert mock_openai.call_count == 2
 
 
 @pytest.mark.asyncio
@@ -127,9 +145,9 @@ async def test_embedding_service_batch_with_mock():
         Mock(embedding=[0.3] * 1536)
     ]
     
-    with patch('src.ai.embedding_service.OpenAI') as mock_openai:
+    with patch('src.ai.embedding_service.AsyncOpenAI') as mock_openai:
         mock_client = Mock()
-        mock_client.embeddings.create.return_value = mock_response
+        mock_client.embeddings.create = AsyncMock(return_value=mock_response)
         mock_openai.return_value = mock_client
         
         service = EmbeddingService(api_key="test_key")
@@ -142,8 +160,85 @@ async def test_embedding_service_batch_with_mock():
         ]
         embeddings = await service.embed_texts(texts)
         
-        assert len(embeddings) == len(texts)
-        assert all(len(emb) == 1536 for emb in embeddings)
+        assert embeddings.shape == (len(texts), 1536)
+
+
+@pytest.mark.asyncio
+async def test_embedding_service_concurrent_batches():
+    """Test that batches are sent concurrently and results keep input order."""
+    in_flight = 0
+    peak = 0
+    
+    async def create(model, input):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return Mock(data=[Mock(embedding=[float(text)] * 1536) for text in input])
+    
+    with patch('src.ai.embedding_service.AsyncOpenAI') as mock_openai:
+        mock_client = Mock()
+        mock_client.embeddings.create = AsyncMock(side_effect=create)
+        mock_openai.return_value = mock_client
+        
+        service = EmbeddingService(api_key="test_key", cache_path="")
+        service.batch_size = 2
+        service.max_concurrency = 3
+        embeddings = await service.embed_texts([str(i) for i in range(10)])
+        
+        assert embeddings[:, 0].tolist() == list(range(10))
+        assert mock_client.embeddings.create.await_count == 5
+        assert peak == 3
+
+
+@pytest.mark.asyncio
+async def test_embedding_service_truncates_long_texts():
+    """Test that texts over the token limit are truncated before being sent."""
+    from src.ai import embedding_service
+    
+    class CharEncoding:
+        """One token per character, enough to exercise truncation."""
+        def encode(self, text, disallowed_special=()):
+            return list(text)
+        
+        def decode(self, tokens):
+            return "".join(tokens)
+    
+    with patch('src.ai.embedding_service.AsyncOpenAI') as mock_openai:
+        mock_client = Mock()
+        mock_client.embeddings.create = AsyncMock(
+            return_value=Mock(data=[Mock(embedding=[0.1] * 1536)] * 2)
+        )
+        mock_openai.return_value = mock_client
+        
+        service = EmbeddingService(api_key="test_key", cache_path="")
+        service._encoding = CharEncoding()
+        await service.embed_texts(["x" * (embedding_service.MAX_INPUT_TOKENS + 10), "short"])
+        
+        sent = mock_client.embeddings.create.call_args.kwargs["input"]
+        assert sent == ["x" * embedding_service.MAX_INPUT_TOKENS, "short"]
+        
+        # Batches are split before they exceed the per-request token budget
+        mock_client.embeddings.create.reset_mock()
+        mock_client.embeddings.create.return_value = Mock(data=[Mock(embedding=[0.1] * 1536)])
+        with patch('src.ai.embedding_service.MAX_BATCH_TOKENS', 10):
+            await service.embed_texts(["aaaaaa", "bbbbbb", "cccc"])
+        
+        sent = [c.kwargs["input"] for c in mock_client.embeddings.create.call_args_list]
+        assert sent == [["aaaaaa"], ["bbbbbb", "cccc"]]
+
+
+def test_embedding_quantize_int8():
+    """Test int8 quantization round-trips within one quantization step."""
+    vectors = np.array([[0.5, -0.25, 0.1], [0.0, 0.0, 0.0]], dtype=np.float32)
+    
+    quantized, scales = EmbeddingService.quantize(vectors)
+    
+    assert quantized.dtype == np.int8
+    assert quantized[0].tolist() == [127, -64, 25]
+    assert np.allclose(quantized * scales[:, None], vectors, atol=scales.max())
+    assert not quantized[1].any()
 
 
 def test_embedding_service_missing_api_key():
@@ -156,6 +251,30 @@ def test_embedding_service_missing_api_key():
             EmbeddingService()
 
 
+@pytest.mark.asyncio
+async def test_embedding_service_cache(tmp_path):
+    """Test that repeated texts are served from the embedding cache."""
+    def create(model, input):
+        return Mock(data=[Mock(embedding=[float(len(text))] * 1536) for text in input])
+    
+    with patch('src.ai.embedding_service.AsyncOpenAI') as mock_openai:
+        mock_client = Mock()
+        mock_client.embeddings.create = AsyncMock(side_effect=create)
+        mock_openai.return_value = mock_client
+        
+        cache_path = str(tmp_path / "embeddings.sqlite3")
+        service = EmbeddingService(api_key="test_key", cache_path=cache_path)
+        await service.embed_texts(["a", "bb"])
+        
+        # New service instance reads the same on-disk cache
+        service = EmbeddingService(api_key="test_key", cache_path=cache_path)
+        embeddings = await service.embed_texts(["bb", "ccc", "a"])
+        
+        assert [emb[0] for emb in embeddings] == [2.0, 3.0, 1.0]
+        assert mock_client.embeddings.create.call_count == 2
+        assert mock_client.embeddings.create.call_args.kwargs["input"] == ["ccc"]
+
+
 @pytest.mark.asyncio
 async def test_context_indexer_with_mock():
     """Test context indexer with mocked dependencies."""
@@ -186,12 +305,244 @@ async def test_context_indexer_with_mock():
         assert "TEST-123" in call_args[1]['documents'][0]
 
 
+@pytest.mark.asyncio
+async def test_context_indexer_confluence_ids_are_compact():
+    """Test that Confluence doc IDs are fixed-length and stable for long titles."""
+    with patch('src.ai.context_indexer.RAGVectorStore') as mock_store_class:
+        mock_store = Mock()
+        mock_store.add_documents = AsyncMock()
+        mock_store_class.return_value = mock_store
+        
+        indexer = ContextIndexer()
+        docs = [{"title": "Überlange Seite " * 50, "content": "x"}, {"id": "12345", "title": "Short"}]
+        
+        await indexer.index_confluence_docs(docs, "TEST")
+        await indexer.index_confluence_docs(docs, "TEST")
+        
+        first_ids = mock_store.add_documents.call_args_list[0][1]['ids']
+        second_ids = mock_store.add_documents.call_args_list[1][1]['ids']
+        assert first_ids == second_ids
+        assert len(set(first_ids)) == 2
+        assert all(len(doc_id) == len("confluence_") + 32 + len("_20240101") for doc_id in first_ids)
+
+
+@pytest.mark.asyncio
+async def test_context_indexer_story_context_single_story_batch(sample_jira_story):
+    """Test that the main and linked stories are indexed in one batch alongside docs."""
+    from src.aggregator.story_collector import StoryContext
+    
+    with patch('src.ai.context_indexer.RAGVectorStore') as mock_store_class:
+        mock_store = Mock()
+        mock_store.add_documents = AsyncMock()
+        mock_store_class.return_value = mock_store
+        
+        linked_story = sample_jira_story.model_copy(update={"key": "PROJ-124"})
+        context = StoryContext(sample_jira_story)
+        context["linked_stories"] = [linked_story, sample_jira_story]
+        context["confluence_docs"] = [{"id": "1", "title": "Doc", "content": "text"}]
+        
+        indexer = ContextIndexer()
+        await indexer.index_story_context(context, "PROJ")
+        
+        calls = {c[1]['collection_name']: c[1]['ids'] for c in mock_store.add_documents.call_args_list}
+        assert calls[mock_store.JIRA_STORIES_COLLECTION] == ["jira_PROJ-123", "jira_PROJ-124"]
+        assert len(calls[mock_store.CONFLUENCE_DOCS_COLLECTION]) == 1
+
+
+@pytest.mark.asyncio
+async def test_context_indexer_story_context_logs_failures(sample_jira_story):
+    """Test that a failed collection is logged by name while the others still index."""
+    from src.aggregator.story_collector import StoryContext
+    
+    with patch('src.ai.context_indexer.RAGVectorStore'), \
+            patch('src.ai.context_indexer.logger') as mock_logger:
+        context = StoryContext(sample_jira_story)
+        context["confluence_docs"] = [{"id": "1", "title": "Doc", "content": "text"}]
+        
+        indexer = ContextIndexer()
+        indexer.index_jira_stories = AsyncMock()
+        indexer.index_confluence_docs = AsyncMock(side_effect=RuntimeError("quota exceeded"))
+        await indexer.index_story_context(context, "PROJ")
+        
+        indexer.index_jira_stories.assert_awaited_once()
+        errors = [c.args[0] for c in mock_logger.error.call_args_list]
+        assert len(errors) == 1
+        assert "Confluence docs" in errors[0] and "quota exceeded" in errors[0]
+
+
+@pytest.mark.asyncio
+async def test_context_indexer_batches_overlap_and_isolate_failures():
+    """Test that batches run two at a time and one failed batch doesn't stop the rest."""
+    in_flight = 0
+    peak = 0
+    
+    async def add_documents(collection_name, documents, metadatas, ids):
+        nonlocal in_flight, peak
+        if ids[0].startswith("test_") and len(ids) == 1:
+            raise RuntimeError("chroma down")
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+    
+    with patch('src.ai.context_indexer.RAGVectorStore') as mock_store_class:
+        mock_store = Mock()
+        mock_store.add_documents = AsyncMock(side_effect=add_documents)
+        mock_store_class.return_value = mock_store
+        
+        indexer = ContextIndexer()
+        indexer.BATCH_SIZE = 2
+        tests = [{"key": f"TEST-T{i}", "name": f"Test {i}"} for i in range(7)]
+        await indexer.index_existing_tests(tests, "TEST")
+        
+        assert mock_store.add_documents.await_count == 4
+        assert peak == indexer.BATCH_CONCURRENCY == 2
+
+
+def test_drop_near_duplicate_tests():
+    """Test that reworded-identical tests are skipped and distinct ones kept."""
+    pytest.importorskip("datasketch")
+    from src.ai.context_indexer import _drop_near_duplicate_tests
+    
+    objective = "Verify that an admin can create a policy with a custom name and see it in the list"
+    tests = [
+        {"key": "T-1", "objective": objective, "precondition": "Admin is logged in"},
+        {"key": "T-2", "objective": objective, "precondition": "Admin is logged in"},
+        {"key": "T-3", "objective": "Verify that deleting a policy removes it from every assigned application"},
+        {"key": "T-4", "name": "No objective"},
+        {"key": "T-5", "name": "No objective either"},
+    ]
+    
+    kept = _drop_near_duplicate_tests(tests)
+    
+    assert [t["key"] for t in kept] == ["T-1", "T-3", "T-4", "T-5"]
+
+
+def test_drop_near_duplicate_tests_keeps_shared_precondition():
+    """Test that tests sharing only a boilerplate precondition are all kept."""
+    pytest.importorskip("datasketch")
+    from src.ai.context_indexer import _drop_near_duplicate_tests
+    
+    tests = [
+        {"key": f"T-{i}", "name": name, "objective": "", "precondition": "User is logged in"}
+        for i, name in enumerate(["Create policy", "Delete policy", "Rename policy"])
+    ]
+    
+    assert _drop_near_duplicate_tests(tests) == tests
+
+
+def test_drop_near_duplicate_tests_keeps_distinct_names():
+    """Test that tests with the same objective but different names are kept."""
+    pytest.importorskip("datasketch")
+    from src.ai.context_indexer import _drop_near_duplicate_tests
+    
+    objective = "Verify that an admin can create a policy with a custom name and see it in the list"
+    tests = [
+        {"key": "T-1", "name": "Create policy from the dashboard", "objective": objective},
+        {"key": "T-2", "name": "Create policy through the public API", "objective": objective},
+    ]
+    
+    assert _drop_near_duplicate_tests(tests) == tests
+
+
+def test_get_indexer_returns_shared_instance():
+    """Test that get_indexer builds the indexer (and its store) only once."""
+    from src.ai import context_indexer
+    
+    with patch('src.ai.context_indexer.RAGVectorStore') as mock_store_class, \
+            patch.object(context_indexer, '_indexer', None):
+        assert context_indexer.get_indexer() is context_indexer.get_indexer()
+        mock_store_class.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_context_indexer_skips_disabled_store():
+    """Test that indexing is a no-op when the vector store is disabled."""
+    with patch('src.ai.context_indexer.RAGVectorStore') as mock_store_class:
+        mock_store = Mock(enabled=False)
+        mock_store.add_documents = AsyncMock()
+        mock_store_class.return_value = mock_store
+        
+        indexer = ContextIndexer()
+        await indexer.index_confluence_docs([{"id": "1", "title": "Doc"}], "TEST")
+        await indexer.index_existing_tests([{"key": "TEST-T1", "name": "Login"}], "TEST")
+        
+        mock_store.add_documents.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_rag_store_query_embedding_shared(tmp_path):
+    """Test that concurrent and repeated queries embed the query text once."""
+    embedding_service = Mock()
+    embedding_service.embed_single = AsyncMock(return_value=np.ones(3, dtype=np.float32))
+    collection = Mock()
+    collection.query.return_value = {'documents': [[]], 'ids': [[]], 'metadatas': [[]], 'distances': [[]]}
+    
+    with patch('src.ai.rag_store.chromadb.PersistentClient') as mock_client_class, \
+            patch('src.ai.rag_store.get_embedding_service', return_value=embedding_service):
+        mock_client_class.return_value.get_or_create_collection.return_value = collection
+        store = RAGVectorStore(collection_path=str(tmp_path))
+        
+        await asyncio.gather(*(store.retrieve_similar(name, "same query") for name in ("a", "b", "c", "d")))
+        await store.retrieve_similar("a", "same query")
+        
+        embedding_service.embed_single.assert_awaited_once_with("same query")
+        assert collection.query.call_count == 5
+
+
+@pytest.mark.asyncio
+async def test_rag_store_failed_query_embedding_not_cached(tmp_path):
+    """Test that a failed (zero) query embedding raises and is retried next time."""
+    embedding_service = Mock()
+    embedding_service.embed_single = AsyncMock(
+        side_effect=[np.zeros(3, dtype=np.float32), np.ones(3, dtype=np.float32)]
+    )
+    
+    with patch('src.ai.rag_store.chromadb.PersistentClient'), \
+            patch('src.ai.rag_store.get_embedding_service', return_value=embedding_service):
+        store = RAGVectorStore(collection_path=str(tmp_path))
+        
+        with pytest.raises(RuntimeError):
+            await store.embed_query("query")
+        embedding = await store.embed_query("query")
+        
+        assert embedding.any()
+        assert embedding_service.embed_single.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_rag_store_collection_counts_cached(tmp_path):
+    """Test that collection handles and counts are cached until the collection changes."""
+    collection = Mock()
+    collection.count.return_value = 7
+    
+    with patch('src.ai.rag_store.chromadb.PersistentClient') as mock_client_class, \
+            patch('src.ai.rag_store.get_embedding_service'):
+        mock_client_class.return_value.get_or_create_collection.return_value = collection
+        store = RAGVectorStore(collection_path=str(tmp_path))
+        
+        assert store.get_collection_stats("a")["count"] == 7
+        assert store.get_collection_stats("a")["count"] == 7
+        assert collection.count.call_count == 1
+        
+        await store.add_documents("a", ["doc"], [{}], ["id-1"], embeddings=np.zeros((1, 3), dtype=np.float32))
+        store.get_collection_stats("a")
+        assert collection.count.call_count == 2
+        
+        get_or_create = mock_client_class.return_value.get_or_create_collection
+        assert get_or_create.call_count == 1
+        store.clear_collection("a")
+        store.get_collection_stats("a")
+        assert get_or_create.call_count == 2
+
+
 @pytest.mark.asyncio
 async def test_rag_retriever_empty_collections():
     """Test RAG retriever handles empty collections gracefully."""
     with patch('src.ai.rag_retriever.RAGVectorStore') as mock_store_class:
         mock_store = Mock()
-        mock_store.get_collection_stats.return_value = {'count': 0}
+        mock_store.embed_query = AsyncMock(return_value=np.zeros(3, dtype=np.float32))
+        mock_store.retrieve_similar_by_vector = AsyncMock(return_value=[])
         mock_store_class.return_value = mock_store
         
         retriever = RAGRetriever()
@@ -227,7 +578,8 @@ async def test_rag_retriever_with_results():
     with patch('src.ai.rag_retriever.RAGVectorStore') as mock_store_class:
         mock_store = Mock()
         mock_store.get_collection_stats.return_value = {'count': 10}
-        mock_store.retrieve_similar = AsyncMock(return_value=mock_results)
+        mock_store.embed_query = AsyncMock(return_value=np.zeros(3, dtype=np.float32))
+        mock_store.retrieve_similar_by_vector = AsyncMock(return_value=mock_results)
         mock_store.TEST_PLANS_COLLECTION = "test_plans"
         mock_store.CONFLUENCE_DOCS_COLLECTION = "confluence_docs"
         mock_store.JIRA_STORIES_COLLECTION = "jira_stories"
@@ -251,3 +603,127 @@ async def test_rag_retriever_with_results():
         assert context.has_context()
         assert len(context.similar_test_plans) > 0
 
+
+
+@pytest.mark.asyncio
+async def test_rag_retriever_embeds_query_once(sample_jira_story):
+    """Test that one query embedding is shared by all four collection searches."""
+    query_embedding = np.ones(3, dtype=np.float32)
+    
+    with patch('src.ai.rag_retriever.RAGVectorStore') as mock_store_class:
+        mock_store = Mock()
+        mock_store.embed_query = AsyncMock(return_value=query_embedding)
+        mock_store.retrieve_similar_by_vector = AsyncMock(return_value=[])
+        mock_store_class.return_value = mock_store
+        
+        retriever = RAGRetriever()
+        await retriever.retrieve_for_story(sample_jira_story)
+        
+        mock_store.embed_query.assert_awaited_once()
+        mock_store.get_collection_stats.assert_not_called()
+        calls = mock_store.retrieve_similar_by_vector.await_args_list
+        assert len(calls) == 4
+        assert all(c.kwargs['query_embedding'] is query_embedding for c in calls)
+        assert all(c.kwargs['metadata_filter'] == {"project_key": "PROJ"} for c in calls)
+
+
+def test_rag_retriever_build_query_strips_markup(sample_jira_story):
+    """Test that the retrieval query drops markup and collapses whitespace."""
+    story = sample_jira_story.model_copy(
+        update={"description": "<p>Users   can\n\nlog in</p><br/>" + "x" * 600, "components": ["Backend"]}
+    )
+    
+    with patch('src.ai.rag_retriever.RAGVectorStore'):
+        query = RAGRetriever()._build_query(story)
+    
+    summary, description, components = query.split("\n")
+    assert summary == story.summary
+    assert description.startswith("Users can log in x")
+    assert len(description) == 500
+    assert components == "Components: Backend"
+
+
+@pytest.mark.asyncio
+async def test_rag_retriever_warmup_queries_each_collection():
+    """Test that warmup probes every collection once and skips a disabled store."""
+    from src.ai import rag_retriever
+    
+    with patch('src.ai.rag_retriever.RAGVectorStore') as mock_store_class, \
+            patch.object(rag_retriever, '_retriever', None):
+        mock_store = Mock(enabled=True)
+        mock_store.retrieve_similar_by_vector = AsyncMock(return_value=[])
+        mock_store_class.return_value = mock_store
+        
+        retriever = rag_retriever.get_retriever()
+        assert rag_retriever.get_retriever() is retriever
+        await retriever.warmup()
+        
+        assert mock_store.retrieve_similar_by_vector.await_count == 4
+        assert all(c.kwargs['top_k'] == 1 for c in mock_store.retrieve_similar_by_vector.await_args_list)
+        
+        mock_store.enabled = False
+        await retriever.warmup()
+        assert mock_store.retrieve_similar_by_vector.await_count == 4
+
+
+@pytest.mark.asyncio
+async def test_rag_retriever_coalesces_identical_retrievals(sample_jira_story):
+    """Test that concurrent retrievals of the same story share one search."""
+    async def embed_query(query):
+        await asyncio.sleep(0)
+        return np.ones(3, dtype=np.float32)
+    
+    with patch('src.ai.rag_retriever.RAGVectorStore') as mock_store_class:
+        mock_store = Mock(enabled=True)
+        mock_store.embed_query = AsyncMock(side_effect=embed_query)
+        mock_store.retrieve_similar_by_vector = AsyncMock(return_value=[])
+        mock_store_class.return_value = mock_store
+        
+        retriever = RAGRetriever()
+        first, second = await asyncio.gather(
+            retriever.retrieve_for_story(sample_jira_story),
+            retriever.retrieve_for_story(sample_jira_story),
+        )
+        
+        assert first is second
+        assert mock_store.embed_query.await_count == 1
+        assert mock_store.retrieve_similar_by_vector.await_count == 4
+        assert retriever._inflight == {}
+        
+        await retriever.retrieve_for_story(sample_jira_story)
+        assert mock_store.embed_query.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_rag_retriever_skips_filter_without_project(sample_jira_story):
+    """Test that an empty project key searches without a metadata filter."""
+    story = sample_jira_story.model_copy(update={"key": "-123"})
+    
+    with patch('src.ai.rag_retriever.RAGVectorStore') as mock_store_class:
+        mock_store = Mock(enabled=True)
+        mock_store.embed_query = AsyncMock(return_value=np.ones(3, dtype=np.float32))
+        mock_store.retrieve_similar_by_vector = AsyncMock(return_value=[])
+        mock_store_class.return_value = mock_store
+        
+        await RAGRetriever().retrieve_for_story(story)
+        
+        calls = mock_store.retrieve_similar_by_vector.await_args_list
+        assert all(c.kwargs['metadata_filter'] is None for c in calls)
+
+
+@pytest.mark.asyncio
+async def test_rag_retriever_skips_short_queries(sample_jira_story):
+    """Test that a story with too little text skips embedding and search."""
+    story = sample_jira_story.model_copy(
+        update={"summary": "Fix typo", "description": None, "components": []}
+    )
+    
+    with patch('src.ai.rag_retriever.RAGVectorStore') as mock_store_class:
+        mock_store = Mock(enabled=True)
+        mock_store.embed_query = AsyncMock()
+        mock_store_class.return_value = mock_store
+        
+        context = await RAGRetriever().retrieve_for_story(story)
+        
+        assert not context.has_context()
+        mock_store.embed_query.assert_not_awaited()
@@ -28,6 +28,114 @@ class TestStoryCollector:
         assert "context_graph" in context
         assert "full_context_text" in context
 
+    @pytest.mark.asyncio
+    async def test_collect_subtask_comments(self, mocker, sample_jira_story):
+        """Test that subtask comments are gathered and failures are skipped."""
+        subtask_a = sample_jira_story.model_copy(update={"key": "PROJ-124"})
+        subtask_b = sample_jira_story.model_copy(update={"key": "PROJ-125"})
+
+        async def get_comments(key):
+            if key == "PROJ-125":
+                raise RuntimeError("boom")
+            return [{"author": "dev", "body": f"note on {key}", "created": ""}]
+
+        mock_jira_client = mocker.MagicMock()
+        mock_jira_client.get_issue_with_subtasks = mocker.AsyncMock(
+            return_value=(sample_jira_story, [subtask_a, subtask_b, subtask_a])
+        )
+        mock_jira_client.get_issue_comments = mocker.AsyncMock(side_effect=get_comments)
+        mock_jira_client.search_with_comments = mocker.AsyncMock(side_effect=RuntimeError("JQL"))
+        mock_jira_client.get_linked_issues = mocker.AsyncMock(return_value=[])
+        mock_jira_client.search_issues = mocker.AsyncMock(return_value=[])
+
+        collector = StoryCollector(jira_client=mock_jira_client, confluence_client=mocker.MagicMock())
+        mocker.patch.object(collector, "_fetch_confluence_docs", mocker.AsyncMock(return_value=[]))
+        context = await collector.collect_story_context("PROJ-123")
+
+        assert list(context["subtask_comments"]) == ["PROJ-124"]
+        assert mock_jira_client.get_issue_comments.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_subtask_comments_bulk_fetch(self, mocker, sample_jira_story):
+        """Test that subtask comments come from one bulk search when it works."""
+        subtask = sample_jira_story.model_copy(update={"key": "PROJ-124"})
+        comments = [{"author": "dev", "body": "done", "created": ""}]
+
+        mock_jira_client = mocker.MagicMock()
+        mock_jira_client.search_with_comments = mocker.AsyncMock(
+            return_value={"PROJ-124": comments, "PROJ-999": []}
+        )
+        mock_jira_client.get_issue_comments = mocker.AsyncMock(return_value=[])
+
+        collector = StoryCollector(jira_client=mock_jira_client, confluence_client=mocker.MagicMock())
+        result = await collector._fetch_subtask_comments("PROJ-123", [subtask])
+
+        assert result == {"PROJ-124": comments}
+        mock_jira_client.search_with_comments.assert_awaited_once_with(
+            "parent = PROJ-123", max_results=100
+        )
+        mock_jira_client.get_issue_comments.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_subtask_comments_fetches_keys_missing_from_bulk(self, mocker, sample_jira_story):
+        """Test that subtasks absent from a truncated bulk result are fetched individually."""
+        subtasks = [
+            sample_jira_story.model_copy(update={"key": "PROJ-124"}),
+            sample_jira_story.model_copy(update={"key": "PROJ-125"}),
+        ]
+        bulk_comments = [{"author": "dev", "body": "done", "created": ""}]
+        single_comments = [{"author": "qa", "body": "verified", "created": ""}]
+
+        mock_jira_client = mocker.MagicMock()
+        mock_jira_client.search_with_comments = mocker.AsyncMock(
+            return_value={"PROJ-124": bulk_comments}
+        )
+        mock_jira_client.get_issue_comments = mocker.AsyncMock(return_value=single_comments)
+
+        collector = StoryCollector(jira_client=mock_jira_client, confluence_client=mocker.MagicMock())
+        result = await collector._fetch_subtask_comments("PROJ-123", subtasks)
+
+        assert result == {"PROJ-124": bulk_comments, "PROJ-125": single_comments}
+        mock_jira_client.get_issue_comments.assert_awaited_once_with("PROJ-125")
+
+    @pytest.mark.asyncio
+    async def test_collect_story_context_isolates_failures(self, mocker, sample_jira_story):
+        """Test that one failing source doesn't discard the others."""
+        linked_story = sample_jira_story.model_copy(update={"key": "PROJ-124"})
+
+        mock_jira_client = mocker.MagicMock()
+        mock_jira_client.get_issue_with_subtasks = mocker.AsyncMock(
+            return_value=(sample_jira_story, [])
+        )
+        mock_jira_client.get_issue_comments = mocker.AsyncMock(return_value=[])
+        mock_jira_client.get_linked_issues = mocker.AsyncMock(return_value=[linked_story])
+
+        collector = StoryCollector(jira_client=mock_jira_client, confluence_client=mocker.MagicMock())
+        mocker.patch.object(
+            collector, "_fetch_related_bugs", mocker.AsyncMock(side_effect=RuntimeError("down"))
+        )
+        mocker.patch.object(collector, "_fetch_confluence_docs", mocker.AsyncMock(return_value=[]))
+        context = await collector.collect_story_context("PROJ-123")
+
+        assert context["related_bugs"] == []
+        assert [s.key for s in context["linked_stories"]] == ["PROJ-124"]
+        assert "PROJ-124" in context["full_context_text"]
+
+    @pytest.mark.asyncio
+    async def test_comments_are_cached_until_reset(self, mocker):
+        """Test that repeated comment lookups hit the cache until reset_cache()."""
+        mock_jira_client = mocker.MagicMock()
+        mock_jira_client.get_issue_comments = mocker.AsyncMock(return_value=[{"body": "hi"}])
+
+        collector = StoryCollector(jira_client=mock_jira_client, confluence_client=mocker.MagicMock())
+        await collector._get_issue_comments("PROJ-124")
+        await collector._get_issue_comments("PROJ-124")
+        assert mock_jira_client.get_issue_comments.await_count == 1
+
+        collector.reset_cache()
+        await collector._get_issue_comments("PROJ-124")
+        assert mock_jira_client.get_issue_comments.await_count == 2
+
     @pytest.mark.asyncio
     async def test_fetch_related_bugs(self, mocker, sample_jira_story):
         """Test fetching related bugs based on components and labels."""
@@ -45,6 +153,130 @@ class TestStoryCollector:
         assert bugs[0].key == "PROJ-200"
         assert bugs[0].issue_type == "Bug"
 
+    @pytest.mark.asyncio
+    async def test_fetch_confluence_docs_from_links(self, mocker, sample_jira_story):
+        """Test that linked Confluence pages are fetched and failed pages skipped."""
+        story = sample_jira_story.model_copy(
+            update={
+                "description": "PRD: https://test.atlassian.net/wiki/spaces/ENG/pages/111 "
+                "and design https://test.atlassian.net/wiki/spaces/ENG/pages/222"
+            }
+        )
+
+        async def get_page(page_id):
+            if page_id == "222":
+                raise RuntimeError("forbidden")
+            return {"id": page_id, "title": f"Page {page_id}"}
+
+        mock_confluence = mocker.MagicMock()
+        mock_confluence.base_url = "https://test.atlassian.net"
+        mock_confluence.get_pages = mocker.AsyncMock(side_effect=RuntimeError("old API"))
+        mock_confluence.get_page = mocker.AsyncMock(side_effect=get_page)
+        mock_confluence.extract_page_content.return_value = "content"
+
+        collector = StoryCollector(jira_client=mocker.MagicMock(), confluence_client=mock_confluence)
+        docs = await collector._fetch_confluence_docs(story)
+
+        assert [doc.id for doc in docs] == ["111"]
+        assert docs[0].url == "https://test.atlassian.net/wiki/spaces/ENG/pages/111"
+        assert mock_confluence.get_page.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_fetch_confluence_docs_bulk(self, mocker, sample_jira_story):
+        """Test that linked pages come from one bulk request, with per-page fetch for misses."""
+        story = sample_jira_story.model_copy(
+            update={
+                "description": "https://test.atlassian.net/wiki/spaces/ENG/pages/111 "
+                "https://test.atlassian.net/wiki/spaces/ENG/pages/222"
+            }
+        )
+
+        mock_confluence = mocker.MagicMock()
+        mock_confluence.base_url = "https://test.atlassian.net"
+        mock_confluence.get_pages = mocker.AsyncMock(return_value=[{"id": "111", "title": "A"}])
+        mock_confluence.get_page = mocker.AsyncMock(return_value={"id": "222", "title": "B"})
+        mock_confluence.extract_page_content.return_value = "content"
+
+        collector = StoryCollector(jira_client=mocker.MagicMock(), confluence_client=mock_confluence)
+        docs = await collector._fetch_confluence_docs(story)
+
+        assert [doc.title for doc in docs] == ["A", "B"]
+        mock_confluence.get_pages.assert_awaited_once_with(["111", "222"])
+        mock_confluence.get_page.assert_awaited_once_with("222")
+
+    @pytest.mark.asyncio
+    async def test_fetch_confluence_docs_key_only_search_without_hooks(self, mocker, sample_jira_story):
+        """Test that stories with no links and no labels only search by story key."""
+        story = sample_jira_story.model_copy(update={"description": "No docs here", "labels": []})
+
+        mock_confluence = mocker.MagicMock()
+        mock_confluence.find_related_pages = mocker.AsyncMock(return_value=[])
+
+        collector = StoryCollector(jira_client=mocker.MagicMock(), confluence_client=mock_confluence)
+        docs = await collector._fetch_confluence_docs(story)
+
+        assert docs == []
+        mock_confluence.find_related_pages.assert_awaited_once_with(
+            story.key, labels=[], search_spaces=False
+        )
+
+    @pytest.mark.asyncio
+    async def test_fetch_subtasks_falls_back_when_combined_query_rejected(self, mocker, sample_jira_story):
+        """Test that a rejected combined query falls back to the per-query loop."""
+        subtask = sample_jira_story.model_copy(update={"key": "PROJ-200"})
+
+        async def search_issues(jql, max_results=50, raise_errors=False):
+            if " OR " in jql:
+                raise RuntimeError("Field 'Parent Link' does not exist")
+            return [subtask] if jql == "parent = PROJ-123" else []
+
+        mock_jira_client = mocker.MagicMock()
+        mock_jira_client.search_issues = mocker.AsyncMock(side_effect=search_issues)
+        collector = StoryCollector(jira_client=mock_jira_client)
+
+        subtasks = await collector._fetch_subtasks("PROJ-123")
+
+        assert [s.key for s in subtasks] == ["PROJ-200"]
+        assert mock_jira_client.search_issues.await_args_list[0].kwargs["raise_errors"] is True
+
+    @pytest.mark.asyncio
+    async def test_fetch_related_bugs_filters_generic_labels(self, mocker, sample_jira_story):
+        """Test that generic labels are dropped and label-less stories skip the query."""
+        mock_jira_client = mocker.MagicMock()
+        mock_jira_client.search_issues = mocker.AsyncMock(return_value=[])
+        collector = StoryCollector(jira_client=mock_jira_client)
+
+        story = sample_jira_story.model_copy(update={"labels": ["triaged", "sso"], "components": []})
+        await collector._fetch_related_bugs(story)
+        jql = mock_jira_client.search_issues.await_args.args[0]
+        assert 'labels in ("sso")' in jql
+        assert "component" not in jql
+
+        generic_only = story.model_copy(update={"labels": ["triaged", "backlog"]})
+        assert await collector._fetch_related_bugs(generic_only) == []
+        assert mock_jira_client.search_issues.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_fetch_related_bugs_logs_capped_filters(self, mocker, sample_jira_story):
+        """Test that components and labels past the JQL cap are reported as dropped."""
+        mock_jira_client = mocker.MagicMock()
+        mock_jira_client.search_issues = mocker.AsyncMock(return_value=[])
+        collector = StoryCollector(jira_client=mock_jira_client)
+        mocker.patch("src.aggregator.story_collector._MAX_JQL_FILTER_VALUES", 1)
+        debug = mocker.patch("src.aggregator.story_collector.logger.debug")
+
+        story = sample_jira_story.model_copy(
+            update={"labels": ["triaged", "sso", "billing"], "components": ["API", "UI"]}
+        )
+        await collector._fetch_related_bugs(story)
+        jql = mock_jira_client.search_issues.await_args.args[0]
+        assert 'component in ("API")' in jql
+        assert 'labels in ("sso")' in jql
+
+        messages = [call.args[0] for call in debug.call_args_list]
+        assert any("components" in m and "'UI'" in m for m in messages)
+        assert any("labels" in m and "'billing'" in m and "'triaged'" in m for m in messages)
+
     def test_build_context_graph(self, sample_jira_story):
         """Test building context graph from stories."""
         linked_story = sample_jira_story.model_copy()
@@ -60,7 +292,8 @@ class TestStoryCollector:
         )
 
         assert graph["main"] == "PROJ-123"
-        assert "PROJ-200" in graph["fixed_by"]
+        assert graph["relates_to"] == ["PROJ-124"]
+        assert graph["fixed_by"] == ["PROJ-200"]
         assert "Backend" in graph["components"]
         assert "authentication" in graph["labels"]
 
@@ -81,3 +314,18 @@ class TestStoryCollector:
         assert "Backend" in text
         assert "authentication" in text
 
+
+    def test_story_context_dict_access(self, sample_jira_story):
+        """Test that StoryContext fields are reachable by key and attribute."""
+        from src.aggregator.story_collector import StoryContext
+
+        context = StoryContext(sample_jira_story)
+        context["linked_stories"] = [sample_jira_story]
+        context["custom_note"] = "extra"
+
+        assert context.linked_stories == [sample_jira_story]
+        assert context["main_story"] is sample_jira_story
+        assert context.get("subtasks", None) == []
+        assert context.get("missing", "default") == "default"
+        assert "custom_note" in context and "missing" not in context
+        assert not hasattr(context, "__dict__")